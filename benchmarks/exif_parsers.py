@@ -0,0 +1,127 @@
+# exif_parsers.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Compare the TIFF-walking EXIF parser with the exif package.
+
+Usage: python3 benchmarks/exif_parsers.py CORPUS_DIR [--repeat N]
+
+Reports files/s (best of N, warm page cache) and, from a separate
+tracemalloc pass, the memory blocks each parser allocates per file and
+the peak memory it needs. Also lists the files where the two parsers
+disagree on the capture time.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.exif_tiff import read_tiff_metadata  # noqa: E402
+from src.utils import get_exif_metadata, get_image_datetime_taken  # noqa: E402
+
+def exif_package(path):
+    dt, ms, _ = get_exif_metadata(path)
+    return dt, ms
+
+def tiff_only(path):
+    try:
+        dt, ms, _, _ = read_tiff_metadata(path)
+    except Exception:
+        return None, None
+    return dt, ms
+
+PARSERS = [
+    ("exif.Image", exif_package),
+    ("TIFF walk only", tiff_only),
+    ("get_image_datetime_taken", get_image_datetime_taken),
+]
+
+def collect(corpus: Path):
+    return [Path(root) / name for root, _, files in os.walk(corpus) for name in files]
+
+def measure(paths, parse, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for path in paths:
+            parse(path)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def allocations_per_file(paths, parse):
+    """
+    Averages over the files of (memory blocks allocated, peak bytes) while
+    parsing each one. Blocks are the tracemalloc snapshot diff across the
+    parse, taken while its result is still held.
+    """
+    blocks = 0
+    peak_bytes = 0
+    tracemalloc.start()
+    for path in paths:
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        start, _ = tracemalloc.get_traced_memory()
+        result = parse(path)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        blocks += sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+        peak_bytes += peak - start
+        del result
+    tracemalloc.stop()
+    return blocks / len(paths), peak_bytes / len(paths)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", type=Path)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = collect(args.corpus)
+    if not paths:
+        parser.error(f"no files under {args.corpus}")
+
+    # Warm the page cache
+    measure(paths, exif_package, 1)
+
+    print(f"{len(paths)} files, best of {args.repeat}")
+    print(f"{'parser':<26} {'files/s':>10} {'us/file':>10} {'blocks/file':>12} {'peak KiB/file':>14}")
+    for label, parse in PARSERS:
+        per_file = measure(paths, parse, args.repeat) / len(paths) * 1e6
+        blocks, peak = allocations_per_file(paths, parse)
+        print(f"{label:<26} {1e6 / per_file:>10.0f} {per_file:>10.1f} {blocks:>12.1f} {peak / 1024:>14.1f}")
+
+    unparsed = 0
+    differences = []
+    for path in paths:
+        expected, walked = exif_package(path), tiff_only(path)
+        if walked[0] is None and expected[0] is not None:
+            unparsed += 1
+        elif walked != expected and expected[0] is not None:
+            differences.append((path, expected, walked))
+    print(f"\nTIFF walk missed {unparsed} capture times the exif package found (served by the fallback)")
+    for path, expected, walked in differences:
+        print(f"differs: {path}: exif {expected}, TIFF walk {walked}")
+
+if __name__ == "__main__":
+    main()
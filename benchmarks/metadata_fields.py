@@ -0,0 +1,83 @@
+# metadata_fields.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Measure what each extra metadata field costs the extractor.
+
+Usage: python3 benchmarks/metadata_fields.py CORPUS_DIR [--repeat N]
+
+Files are read once up front and then parsed from the page cache, so the
+numbers are parse cost rather than disk speed.
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils import get_image_metadata  # noqa: E402
+
+# Each step adds one more field on top of the previous one
+FIELD_STEPS = [
+    ("date only", frozenset()),
+    ("+ counter", frozenset({"counter"})),
+    ("+ model", frozenset({"counter", "model"})),
+    ("+ lens_model", frozenset({"counter", "model", "lens_model"})),
+    ("+ make", frozenset({"counter", "model", "lens_model", "make"})),
+]
+
+def collect(corpus: Path):
+    return [Path(root) / name for root, _, files in os.walk(corpus) for name in files]
+
+def measure(paths, fields, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for path in paths:
+            get_image_metadata(path, fields)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", type=Path)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = collect(args.corpus)
+    if not paths:
+        parser.error(f"no files under {args.corpus}")
+
+    # Warm the page cache
+    measure(paths, frozenset(), 1)
+
+    print(f"{len(paths)} files, best of {args.repeat}")
+    print(f"{'fields':<14} {'files/s':>10} {'us/file':>10} {'delta us':>10}")
+    previous = None
+    for label, fields in FIELD_STEPS:
+        per_file = measure(paths, fields, args.repeat) / len(paths) * 1e6
+        delta = "" if previous is None else f"{per_file - previous:+.1f}"
+        print(f"{label:<14} {1e6 / per_file:>10.0f} {per_file:>10.1f} {delta:>10}")
+        previous = per_file
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# archives.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import tarfile
+import zipfile
+from collections import namedtuple
+from pathlib import Path
+
+# One regular file in an archive. open() returns a readable file object;
+# for sequential archives it is only valid until the next member.
+ArchiveMember = namedtuple("ArchiveMember", ["name", "size", "open"])
+
+class ZipSource:
+    """Zip archive source. Members can be opened in any order, any number of times."""
+
+    sequential = False
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(self.path)
+
+    def members(self):
+        for info in self._zip.infolist():
+            if not info.is_dir():
+                yield ArchiveMember(info.filename, info.file_size, lambda info=info: self._zip.open(info))
+
+    def close(self):
+        self._zip.close()
+
+class TarSource:
+    """
+    Tar archive source, plain or compressed. The archive is read once from
+    start to end as a stream, so each member can only be read while it is
+    the current one.
+    """
+
+    sequential = True
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._tar = tarfile.open(self.path, "r|*")
+
+    def members(self):
+        for info in self._tar:
+            if info.isfile():
+                yield ArchiveMember(info.name, info.size, lambda info=info: self._tar.extractfile(info))
+
+    def close(self):
+        self._tar.close()
+
+def open_archive(path: Path):
+    """A ZipSource or TarSource for path, or None when it isn't an archive file"""
+    path = Path(path)
+    if not path.is_file():
+        return None
+    if zipfile.is_zipfile(path):
+        return ZipSource(path)
+    if tarfile.is_tarfile(path):
+        return TarSource(path)
+    return None
@@ -0,0 +1,219 @@
+# autotune.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+from . import store
+
+DEFAULT_METADATA_WORKERS = (1, 16)
+DEFAULT_TRANSFER_WORKERS = (1, 8)
+# Where a stage starts when nothing is remembered for its device
+STARTING_LIMIT = 4
+
+# Completed operations per adjustment step
+WINDOW = 16
+# Relative change in latency/throughput treated as noise
+TOLERANCE = 0.10
+DECREASE_FACTOR = 0.75
+
+class ConcurrencyController:
+    """
+    AIMD concurrency limit for one pipeline stage.
+
+    Every WINDOW completed operations the controller compares the window's
+    throughput with the previous one. Throughput is estimated with Little's
+    law (average operations in flight / average latency), so time a stage
+    spends idle between directories doesn't count against it. If latency
+    grew without a matching gain in throughput the limit is cut by a
+    quarter, if throughput fell it steps back by one, otherwise it grows by
+    one. The level with the best throughput seen is kept as `best_limit`.
+    """
+
+    def __init__(self, name: str, minimum: int, maximum: int, initial: int = None, on_change=None):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial or STARTING_LIMIT))
+        self.on_change = on_change
+        self.started = time.monotonic()
+        # (seconds since start, limit, ops/s, average latency) per window
+        self.history = []
+        self.best_limit = None
+        self._best_throughput = 0.0
+        self._previous = None
+        self._reset_window()
+        self._lock = threading.Lock()
+
+    @property
+    def fixed(self) -> bool:
+        return self.minimum == self.maximum
+
+    def _reset_window(self):
+        self._count = 0
+        self._latency = 0.0
+        self._in_flight = 0
+
+    def record(self, seconds: float, in_flight: int):
+        """Report one completed operation and how many were running when it ended"""
+        with self._lock:
+            self._count += 1
+            self._latency += seconds
+            self._in_flight += in_flight
+            if self._count >= WINDOW:
+                self._adjust()
+
+    def _adjust(self):
+        latency = self._latency / self._count
+        throughput = (self._in_flight / self._count) / latency if latency > 0 else 0.0
+        self._reset_window()
+
+        self.history.append((round(time.monotonic() - self.started, 3), self.limit, throughput, latency))
+        if throughput > self._best_throughput:
+            self._best_throughput = throughput
+            self.best_limit = self.limit
+
+        if self.fixed:
+            return
+
+        new_limit = self.limit + 1
+        if self._previous is not None:
+            previous_throughput, previous_latency = self._previous
+            if latency > previous_latency * (1 + TOLERANCE) and throughput <= previous_throughput * (1 + TOLERANCE):
+                new_limit = min(self.limit - 1, int(self.limit * DECREASE_FACTOR))
+            elif throughput < previous_throughput * (1 - TOLERANCE):
+                new_limit = self.limit - 1
+        self._previous = (throughput, latency)
+
+        new_limit = min(self.maximum, max(self.minimum, new_limit))
+        if new_limit != self.limit:
+            old_limit, self.limit = self.limit, new_limit
+            if self.on_change:
+                self.on_change(self, old_limit, new_limit, throughput, latency)
+
+def _timed(fn, item):
+    started = time.monotonic()
+    result = fn(item)
+    return result, time.monotonic() - started
+
+def run_adaptive(executor, controller: ConcurrencyController, fn, items):
+    """
+    Run fn over items on executor with at most controller.limit calls in
+    flight, feeding each call's latency back to the controller. Results come
+    back in the order of items. fn is expected to handle its own errors.
+    """
+    items = list(items)
+    if controller.maximum == 1 or len(items) <= 1:
+        results = []
+        for item in items:
+            result, seconds = _timed(fn, item)
+            controller.record(seconds, 1)
+            results.append(result)
+        return results
+
+    results = [None] * len(items)
+    pending = iter(enumerate(items))
+    in_flight = {}
+
+    def fill():
+        while len(in_flight) < controller.limit:
+            try:
+                index, item = next(pending)
+            except StopIteration:
+                return
+            in_flight[executor.submit(_timed, fn, item)] = index
+
+    fill()
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = in_flight.pop(future)
+            result, seconds = future.result()
+            controller.record(seconds, len(in_flight) + 1)
+            results[index] = result
+        fill()
+    return results
+
+def device_key(path: Path) -> str:
+    """
+    A name for the storage behind `path` that survives remounts: the mount
+    source from /proc/self/mounts (/dev/sdb1, //nas/share, ...), falling
+    back to the device number.
+    """
+    path = Path(path).resolve()
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    try:
+        device = os.stat(path).st_dev
+    except OSError:
+        return "unknown"
+
+    mount_point = path
+    while mount_point != mount_point.parent:
+        try:
+            if os.stat(mount_point.parent).st_dev != device:
+                break
+        except OSError:
+            break
+        mount_point = mount_point.parent
+
+    try:
+        with open("/proc/self/mounts") as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) > 2 and fields[1] == str(mount_point):
+                    return f"{fields[0]} on {fields[1]} ({fields[2]})"
+    except OSError:
+        pass
+    return f"dev {os.major(device)}:{os.minor(device)}"
+
+class TuningStore:
+    """Remembers the best concurrency level found for each device and stage"""
+
+    def __init__(self, conn=None):
+        self._lock = threading.Lock()
+        self._conn = conn if conn is not None else store.connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tuning ("
+            " device TEXT NOT NULL,"
+            " stage TEXT NOT NULL,"
+            " level INTEGER NOT NULL,"
+            " updated REAL NOT NULL,"
+            " PRIMARY KEY (device, stage))"
+        )
+
+    def load(self, device: str, stage: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT level FROM tuning WHERE device = ? AND stage = ?", (device, stage)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, device: str, stage: str, level: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tuning VALUES (?, ?, ?, ?)", (device, stage, level, time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
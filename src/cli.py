@@ -0,0 +1,345 @@
+# cli.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import argparse
+from pathlib import Path
+from gi.repository import Gio, GLib
+from .autotune import DEFAULT_METADATA_WORKERS, DEFAULT_TRANSFER_WORKERS, TuningStore
+from .library_index import LibraryIndex
+from .metrics import RunMetrics
+from .profiling import PROFILE_MODES, RunProfiler
+from .service import BUS_NAME, INTERFACE_NAME, OBJECT_PATH
+from .traversal import DEFAULT_WALK_WORKERS
+from .throttle import IOPRIO_CLASSES, IoLimiter, set_io_priority, set_niceness
+from .utils import handle_files, open_dir_index
+from .run_log import RunLog
+
+def worker_bounds(value: str):
+    """Parse MIN:MAX, or a single N for a fixed level"""
+    try:
+        minimum, _, maximum = value.partition(":")
+        bounds = (int(minimum), int(maximum or minimum))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected N or MIN:MAX, got {value!r}")
+    if not 1 <= bounds[0] <= bounds[1]:
+        raise argparse.ArgumentTypeError(f"bounds must satisfy 1 <= MIN <= MAX, got {value!r}")
+    return bounds
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="photoorganizer --cli",
+        description="Organize and optionally rename photos based on datetime taken."
+    )
+
+    parser.add_argument(
+        "source",
+        type=Path,
+        nargs="?",
+        help="Directory containing unorganized photos"
+    )
+
+    parser.add_argument(
+        "--rename",
+        action="store_true",
+        help="Rename photos based on datetime taken (EXIF)"
+    )
+
+    parser.add_argument(
+        "--organize",
+        type=Path,
+        metavar="DEST",
+        help="Destination directory to organize photos into"
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show what would happen without making any changes"
+    )
+
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rescan every directory, ignoring the record of unchanged ones"
+    )
+
+    parser.add_argument(
+        "--library-index",
+        action="store_true",
+        help="Answer collision and duplicate checks in the destination from an index of it"
+    )
+
+    parser.add_argument(
+        "--log-compress",
+        action="store_true",
+        help="Gzip rotated segments of the run log"
+    )
+
+    parser.add_argument(
+        "--walk-workers",
+        type=int,
+        default=DEFAULT_WALK_WORKERS,
+        metavar="N",
+        help="Number of directories to list concurrently"
+    )
+
+    parser.add_argument(
+        "--ordered",
+        action=argparse.BooleanOptionalAction,
+        help="Handle directories in a fixed order, whatever order their listings finish in "
+             "(default: on with --organize, off for renames in place)"
+    )
+
+    parser.add_argument(
+        "--metadata-workers",
+        type=worker_bounds,
+        metavar="MIN:MAX",
+        help="Bounds for concurrent metadata reads, tuned at runtime (default: %d:%d)" % DEFAULT_METADATA_WORKERS
+    )
+
+    parser.add_argument(
+        "--transfer-workers",
+        type=worker_bounds,
+        metavar="MIN:MAX",
+        help="Bounds for concurrent transfers, tuned at runtime (default: %d:%d)" % DEFAULT_TRANSFER_WORKERS
+    )
+
+    parser.add_argument(
+        "--max-bytes-per-sec",
+        type=int,
+        metavar="BYTES",
+        help="Limit bytes read and copied per second"
+    )
+
+    parser.add_argument(
+        "--max-files-per-sec",
+        type=float,
+        metavar="FILES",
+        help="Limit files handled per second"
+    )
+
+    parser.add_argument(
+        "--ionice-class",
+        choices=sorted(IOPRIO_CLASSES),
+        help="I/O scheduling class for the worker, as with ionice"
+    )
+
+    parser.add_argument(
+        "--ionice-level",
+        type=int,
+        default=4,
+        choices=range(8),
+        metavar="0-7",
+        help="Priority within the best-effort I/O class"
+    )
+
+    parser.add_argument(
+        "--nice",
+        type=int,
+        help="Niceness for the worker"
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="cprofile",
+        choices=PROFILE_MODES,
+        help="Profile the run (cprofile by default) and write the results next to the run log"
+    )
+
+    parser.add_argument(
+        "--report-textfile",
+        type=Path,
+        metavar="PATH",
+        help="Also export the run report in Prometheus textfile format, e.g. for node_exporter"
+    )
+
+    parser.add_argument(
+        "--submit",
+        action="store_true",
+        help="Queue the run on the background service instead of running it here"
+    )
+
+    parser.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        help="Priority of a submitted run; higher runs first"
+    )
+
+    parser.add_argument(
+        "--cancel",
+        type=int,
+        metavar="JOB",
+        help="Cancel a job queued on the background service"
+    )
+
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Suppress console output"
+    )
+
+    args = parser.parse_args(argv)
+    if args.source is None and args.cancel is None:
+        parser.error("the following arguments are required: source")
+    return args
+
+def _call_service(bus, method, parameters, reply_type):
+    return bus.call_sync(
+        BUS_NAME,
+        OBJECT_PATH,
+        INTERFACE_NAME,
+        method,
+        parameters,
+        GLib.VariantType.new(reply_type),
+        Gio.DBusCallFlags.NONE,
+        -1,
+        None
+    ).unpack()
+
+def submit(args):
+    """Queue a run on the background service and follow its log until it finishes"""
+    bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+
+    if args.cancel is not None:
+        (found,) = _call_service(bus, "Cancel", GLib.Variant("(u)", (args.cancel,)), "(b)")
+        if not found:
+            print(f"No such job: {args.cancel}")
+        return 0 if found else 1
+
+    options = {
+        "source": GLib.Variant("s", str(args.source.resolve())),
+        "rename": GLib.Variant("b", args.rename),
+        "full": GLib.Variant("b", args.full),
+        "walk_workers": GLib.Variant("i", args.walk_workers),
+    }
+    if args.organize is not None:
+        options["destination"] = GLib.Variant("s", str(args.organize.resolve()))
+    if args.ordered is not None:
+        options["ordered"] = GLib.Variant("b", args.ordered)
+    if args.metadata_workers is not None:
+        options["metadata_workers"] = GLib.Variant("(ii)", args.metadata_workers)
+    if args.transfer_workers is not None:
+        options["transfer_workers"] = GLib.Variant("(ii)", args.transfer_workers)
+    if args.profile is not None:
+        options["profile"] = GLib.Variant("s", args.profile)
+    if args.report_textfile is not None:
+        options["report_textfile"] = GLib.Variant("s", str(args.report_textfile.resolve()))
+    if args.library_index:
+        options["library_index"] = GLib.Variant("b", True)
+    # Limits given on the command line apply to this job only
+    if args.max_bytes_per_sec is not None:
+        options["bytes_per_sec"] = GLib.Variant("d", args.max_bytes_per_sec)
+    if args.max_files_per_sec is not None:
+        options["files_per_sec"] = GLib.Variant("d", args.max_files_per_sec)
+    if args.ionice_class is not None:
+        options["io_class"] = GLib.Variant("s", args.ionice_class)
+        options["io_level"] = GLib.Variant("i", args.ionice_level)
+    if args.nice is not None:
+        options["nice"] = GLib.Variant("i", args.nice)
+
+    loop = GLib.MainLoop()
+    job = {"id": None, "state": None}
+
+    def on_signal(connection, sender, object_path, interface_name, signal_name, parameters):
+        job_id, value = parameters.unpack()
+        if job_id != job["id"]:
+            return
+        if signal_name == "JobLog":
+            if not args.quiet:
+                print(value)
+        else:
+            job["state"] = value
+            loop.quit()
+
+    bus.signal_subscribe(None, INTERFACE_NAME, None, OBJECT_PATH, None, Gio.DBusSignalFlags.NONE, on_signal)
+
+    method = "DryRun" if args.dry_run else "Organize"
+    (job["id"],) = _call_service(bus, method, GLib.Variant("(a{sv}i)", (options, args.priority)), "(u)")
+    if not args.quiet:
+        print(f"Submitted job {job['id']}")
+
+    loop.run()
+    return 0 if job["state"] == "done" else 1
+
+def main(argv=None):
+    """Entry point for `photoorganizer --cli`"""
+    args = parse_args(argv)
+    if args.submit or args.cancel is not None:
+        return submit(args)
+
+    organize_enabled = args.organize is not None
+    # Resolved like the library index resolves its root, so targets
+    # built from it are found in the index
+    organize_dir = args.organize.resolve() if organize_enabled else args.source
+    run_log = RunLog(compress=args.log_compress)
+
+    def logger(message):
+        run_log.write(message)
+        if not args.quiet:
+            print(message)
+
+    limiter = IoLimiter(args.max_bytes_per_sec or 0, args.max_files_per_sec or 0)
+    metrics = RunMetrics()
+    if args.ionice_class is not None:
+        set_io_priority(IOPRIO_CLASSES[args.ionice_class], args.ionice_level)
+    if args.nice is not None:
+        set_niceness(args.nice)
+
+    dir_index = open_dir_index(args.source, args.rename, organize_enabled, organize_dir, full=args.full)
+    tuning = TuningStore()
+    profiler = RunProfiler(args.profile, run_log.path) if args.profile else None
+    library = None
+    if args.library_index and organize_enabled:
+        library = LibraryIndex(organize_dir)
+        logger(f"Library index: scanned {library.prepare(full=args.full)} folders")
+    try:
+        handle_files(
+            source_folder=args.source,
+            rename_enabled=args.rename,
+            organize_enabled=organize_enabled,
+            organize_dir=organize_dir,
+            dry_run=args.dry_run,
+            logger=logger,
+            dir_index=dir_index,
+            limiter=limiter,
+            metrics=metrics,
+            walk_workers=args.walk_workers,
+            ordered_walk=args.ordered,
+            metadata_workers=args.metadata_workers or DEFAULT_METADATA_WORKERS,
+            transfer_workers=args.transfer_workers or DEFAULT_TRANSFER_WORKERS,
+            tuning=tuning,
+            profiler=profiler,
+            report_textfile=args.report_textfile,
+            library=library
+        )
+    finally:
+        metrics.finish()
+        for line in metrics.summary_lines():
+            logger(line)
+        dir_index.close()
+        tuning.close()
+        if library:
+            library.close()
+        run_log.close()
+
+    if not args.quiet:
+        print(f"Log written to {run_log.path}")
+    return 0
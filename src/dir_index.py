@@ -0,0 +1,96 @@
+# dir_index.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import hashlib
+import json
+import threading
+from collections import namedtuple
+from . import store
+
+DirectoryRecord = namedtuple("DirectoryRecord", ["mtime_ns", "digest", "subdirs"])
+
+def make_signature(*parts) -> str:
+    """Hash the run options so a changed pattern or destination never reuses old records"""
+    return hashlib.sha1("\0".join(str(part) for part in parts).encode()).hexdigest()
+
+def entries_digest(names) -> str:
+    """Digest of a directory's entry list, independent of listing order"""
+    return hashlib.sha1("\0".join(sorted(names)).encode()).hexdigest()
+
+class DirectoryIndex:
+    """
+    Remembers, per source directory, what it looked like after the last
+    successful pass so that unchanged directories can be skipped on re-runs.
+
+    Records are scoped by a run signature (see make_signature). When `full`
+    is set, lookups always miss but records are still written, which forces
+    a complete rescan and refreshes the index.
+    """
+
+    def __init__(self, signature: str, full: bool = False, conn=None):
+        self.signature = signature
+        self.full = full
+        self._lock = threading.Lock()
+        self._conn = conn if conn is not None else store.connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS directories ("
+            " signature TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " digest TEXT NOT NULL,"
+            " subdirs TEXT NOT NULL,"
+            " PRIMARY KEY (signature, path))"
+        )
+
+    def lookup(self, path: str):
+        if self.full:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, digest, subdirs FROM directories WHERE signature = ? AND path = ?",
+                (self.signature, path),
+            ).fetchone()
+
+        if row is None:
+            return None
+        return DirectoryRecord(row[0], row[1], json.loads(row[2]))
+
+    def record(self, path: str, mtime_ns: int, digest: str, subdirs):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?)",
+                (self.signature, path, mtime_ns, digest, json.dumps(list(subdirs))),
+            )
+
+    def forget(self, path: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM directories WHERE signature = ? AND path = ?",
+                (self.signature, path),
+            )
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
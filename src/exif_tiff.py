@@ -0,0 +1,243 @@
+# exif_tiff.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+from datetime import datetime
+from pathlib import Path
+from struct import unpack_from
+from .profiling import count_syscall
+
+# TIFF tags read, by the IFD they live in
+TAG_DATETIME = 0x0132
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+TAG_SUBSEC_TIME = 0x9290
+TAG_SUBSEC_TIME_ORIGINAL = 0x9291
+TAG_SUBSEC_TIME_DIGITIZED = 0x9292
+TAG_LENS_MODEL = 0xA434
+
+TYPE_ASCII = 2
+TYPE_LONG = 4
+ENTRY_SIZE = 12
+
+# Metadata fields this parser can fill, and the tag each comes from
+FIELD_TAGS = {
+    "make": TAG_MAKE,
+    "model": TAG_MODEL,
+    "lens_model": TAG_LENS_MODEL,
+}
+SUPPORTED_FIELDS = frozenset(FIELD_TAGS) | {"counter"}
+
+# Same priority as parse_datetime_with_milliseconds
+DATETIME_TAGS = [
+    (TAG_DATETIME_ORIGINAL, TAG_SUBSEC_TIME_ORIGINAL),
+    (TAG_DATETIME_DIGITIZED, TAG_SUBSEC_TIME_DIGITIZED),
+    (TAG_DATETIME, TAG_SUBSEC_TIME),
+]
+
+# TIFF magic numbers: plain TIFF (and the RAW formats built on it),
+# Olympus ORF and Panasonic RW2
+TIFF_MAGIC = {42, 0x4F52, 0x5352, 0x55}
+
+# Files are read in blocks of this size, each at most once per parse
+BLOCK_SIZE = 4096
+
+class _View:
+    """
+    Bounds-checked reads from an image file that note which blocks they touch.
+
+    read_block(index) returns the bytes of one block. Blocks are fetched the
+    first time a read needs them and kept for the rest of the parse.
+    """
+
+    def __init__(self, read_block, size: int):
+        self.read_block = read_block
+        self.size = size
+        self.blocks = {}
+
+    def unpack(self, fmt: str, offset: int, length: int):
+        self.touch(offset, length)
+        block, start = divmod(offset, BLOCK_SIZE)
+        if start + length <= BLOCK_SIZE:
+            # Straight from the block, no copy
+            return unpack_from(fmt, self.blocks[block], start)
+        return unpack_from(fmt, self.bytes(offset, length))
+
+    def touch(self, offset: int, length: int):
+        if offset < 0 or length < 0 or offset + length > self.size:
+            raise ValueError(f"Read past the end of the file at {offset}")
+        if length:
+            for block in range(offset // BLOCK_SIZE, (offset + length - 1) // BLOCK_SIZE + 1):
+                if block not in self.blocks:
+                    self.blocks[block] = self.read_block(block)
+
+    def bytes(self, offset: int, count: int) -> bytes:
+        self.touch(offset, count)
+        first, start = divmod(offset, BLOCK_SIZE)
+        if start + count <= BLOCK_SIZE:
+            return self.blocks[first][start:start + count]
+        last = (offset + count - 1) // BLOCK_SIZE
+        return b"".join(self.blocks[block] for block in range(first, last + 1))[start:start + count]
+
+    def ascii(self, offset: int, count: int) -> str:
+        return self.bytes(offset, count).rstrip(b"\0").decode("ascii")
+
+def _find_tiff(view: _View) -> int:
+    """Offset of the TIFF header: at the start of TIFF-based files, inside the EXIF APP1 segment of JPEGs"""
+    start = view.bytes(0, min(2, view.size))
+    if start in (b"II", b"MM"):
+        return 0
+    if start != b"\xff\xd8":
+        raise ValueError("Not a JPEG or TIFF file")
+
+    position = 2
+    while True:
+        marker, kind = view.unpack("BB", position, 2)
+        if marker != 0xFF:
+            raise ValueError(f"Bad JPEG marker at {position}")
+        if kind == 0xFF:
+            # Fill byte
+            position += 1
+            continue
+        if kind in (0xD9, 0xDA):
+            # End of image, or start of the compressed data: no EXIF segment
+            return -1
+        if kind == 0x01 or 0xD0 <= kind <= 0xD7:
+            position += 2
+            continue
+        (length,) = view.unpack(">H", position + 2, 2)
+        if kind == 0xE1 and length >= 8:
+            if view.bytes(position + 4, 6) == b"Exif\0\0":
+                return position + 10
+        position += 2 + length
+
+class _Tiff:
+    def __init__(self, view: _View, base: int):
+        self.view = view
+        self.base = base
+        order = view.bytes(base, 2)
+        if order == b"II":
+            self.order = "<"
+        elif order == b"MM":
+            self.order = ">"
+        else:
+            raise ValueError("Bad TIFF byte order")
+        (magic,) = view.unpack(self.order + "H", base + 2, 2)
+        if magic not in TIFF_MAGIC:
+            raise ValueError(f"Bad TIFF magic {magic:#x}")
+        (self.first_ifd,) = view.unpack(self.order + "I", base + 4, 4)
+
+    def read_ifd(self, offset: int, wanted) -> dict:
+        """The entries of the IFD at offset whose tag is in wanted, as tag -> (type, count, value field offset)"""
+        view = self.view
+        start = self.base + offset
+        (count,) = view.unpack(self.order + "H", start, 2)
+        view.touch(start + 2, count * ENTRY_SIZE)
+        found = {}
+        for index in range(count):
+            entry = start + 2 + index * ENTRY_SIZE
+            tag, kind, value_count = view.unpack(self.order + "HHI", entry, 8)
+            if tag in wanted:
+                found[tag] = (kind, value_count, entry + 8)
+        return found
+
+    def ascii(self, entry) -> str:
+        kind, count, field = entry
+        if kind != TYPE_ASCII:
+            raise ValueError(f"Unexpected tag type {kind}")
+        if count > 4:
+            (offset,) = self.view.unpack(self.order + "I", field, 4)
+            field = self.base + offset
+        return self.view.ascii(field, count)
+
+    def long(self, entry) -> int:
+        kind, count, field = entry
+        if kind != TYPE_LONG or count != 1:
+            raise ValueError(f"Unexpected tag type {kind}")
+        return self.view.unpack(self.order + "I", field, 4)[0]
+
+def parse_ifds(read_block, size: int, fields=frozenset()):
+    """
+    Read the capture time and the requested fields from an image file of
+    size bytes, fetching its blocks with read_block(index). Returns
+    (datetime, milliseconds, {field: value}, blocks read); datetime is None
+    when the file has no capture time. Raises ValueError (or struct.error)
+    for anything it can't parse.
+    """
+    view = _View(read_block, size)
+    base = _find_tiff(view)
+    if base < 0:
+        return None, None, {}, view.blocks
+    return _parse_tiff(_Tiff(view, base), fields)
+
+def _parse_tiff(tiff: _Tiff, fields):
+    field_tags = {FIELD_TAGS[field] for field in fields if field in FIELD_TAGS}
+    tags = tiff.read_ifd(tiff.first_ifd, {TAG_DATETIME, TAG_EXIF_IFD} | field_tags)
+    if TAG_EXIF_IFD in tags:
+        wanted = {tag for pair in DATETIME_TAGS for tag in pair} | field_tags
+        tags.update(tiff.read_ifd(tiff.long(tags[TAG_EXIF_IFD]), wanted))
+
+    for date_tag, subsec_tag in DATETIME_TAGS:
+        dt_str = tiff.ascii(tags[date_tag]) if date_tag in tags else None
+        if dt_str:
+            break
+    else:
+        return None, None, {}, tiff.view.blocks
+
+    ms_str = "000"
+    subsec = tiff.ascii(tags[subsec_tag]) if subsec_tag in tags else None
+    if subsec:
+        ms_str = subsec.rjust(3, "0")[:3]
+    dt = datetime.strptime(dt_str, "%Y:%m:%d %H:%M:%S")
+
+    metadata = {}
+    for field in fields:
+        if field in FIELD_TAGS:
+            tag = FIELD_TAGS[field]
+            metadata[field] = tiff.ascii(tags[tag]) if tag in tags else None
+    return dt, ms_str, metadata, tiff.view.blocks
+
+def read_tiff_metadata(image_path: Path, fields=frozenset()):
+    """
+    Parse image_path with parse_ifds, reading only the blocks that hold the
+    header and the IFD entries read, wherever in the file they sit. Blocks
+    are read with pread rather than mapped, so a file that shrinks or a
+    network share that drops mid-parse raises an error instead of SIGBUS.
+    Returns (datetime, milliseconds, metadata, bytes read).
+    """
+    count_syscall("open")
+    with open(image_path, "rb", buffering=0) as f:
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        if not size:
+            raise ValueError("Empty file")
+
+        def read_block(index: int) -> bytes:
+            offset = index * BLOCK_SIZE
+            length = min(BLOCK_SIZE, size - offset)
+            data = os.pread(fd, length, offset)
+            if len(data) < length:
+                raise ValueError(f"File shrank while reading at {offset}")
+            return data
+
+        dt, ms, metadata, blocks = parse_ifds(read_block, size, fields)
+    return dt, ms, metadata, sum(len(block) for block in blocks.values())
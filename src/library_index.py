@@ -0,0 +1,330 @@
+# library_index.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import re
+import threading
+from pathlib import Path
+from . import store
+
+# "IMG (3).jpg" -> "IMG.jpg": names resolve_collision derives from one target
+_COLLISION_SUFFIX = re.compile(r" \(\d+\)(?=\.[^.]*$|$)")
+
+def name_family(name: str) -> str:
+    return _COLLISION_SUFFIX.sub("", name, count=1)
+
+def _join(folder: str, name: str) -> str:
+    return f"{folder}/{name}" if folder and name else folder or name
+
+class _Folder:
+    """In-memory view of one destination folder"""
+
+    def __init__(self, entries):
+        # name -> (size, taken); taken is None when the capture time isn't known
+        self.entries = dict(entries)
+        self.families = {}
+        for name in self.entries:
+            self.families.setdefault(name_family(name), []).append(name)
+
+    def add(self, name: str, size: int, taken):
+        if name not in self.entries:
+            self.families.setdefault(name_family(name), []).append(name)
+        self.entries[name] = (size, taken)
+
+class LibraryIndex:
+    """
+    Index of the files already in a destination tree.
+
+    Built once with a bulk scandir walk, then kept current by the engine
+    recording its own writes. Folders are loaded from the store into memory
+    the first time a run touches them, so collision, duplicate and "already
+    organized" checks in a folder with tens of thousands of photos cost no
+    file system calls. prepare() checks every known folder's mtime against
+    the disk and rescans the ones that drifted.
+    """
+
+    def __init__(self, root: Path, conn=None):
+        self.root = Path(root).resolve()
+        self._key = str(self.root)
+        self._lock = threading.RLock()
+        self._conn = conn if conn is not None else store.connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS library_folders ("
+            " root TEXT NOT NULL,"
+            " folder TEXT NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " PRIMARY KEY (root, folder))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS library_files ("
+            " root TEXT NOT NULL,"
+            " folder TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " taken TEXT,"
+            " PRIMARY KEY (root, folder, name))"
+        )
+        self._mtimes = dict(self._conn.execute(
+            "SELECT folder, mtime_ns FROM library_folders WHERE root = ?", (self._key,)
+        ))
+        self._loaded = {}
+        self._touched = set()
+
+    def prepare(self, full: bool = False) -> int:
+        """
+        Build the index, or bring it up to date with the disk. Returns the
+        number of folders that had to be scanned.
+        """
+        with self._lock:
+            if full or not self._mtimes:
+                self._drop_folder("")
+                return self._scan_tree("")
+
+            scanned = 0
+            for folder, mtime_ns in sorted(self._mtimes.items()):
+                if folder not in self._mtimes:
+                    # Dropped with a parent that disappeared
+                    continue
+                try:
+                    current = os.stat(self._path(folder)).st_mtime_ns
+                except OSError:
+                    self._drop_folder(folder)
+                    continue
+                if current != mtime_ns:
+                    scanned += self._scan_folder(folder)
+            self._conn.commit()
+            return scanned
+
+    def _path(self, folder: str) -> Path:
+        return self.root / folder if folder else self.root
+
+    def _split(self, path: Path):
+        """(folder, name) for a path inside the tree, or None"""
+        try:
+            relative = Path(os.path.abspath(path)).relative_to(self.root)
+        except ValueError:
+            return None
+        parent = relative.parent.as_posix()
+        return ("" if parent == "." else parent), relative.name
+
+    def _scan_tree(self, folder: str) -> int:
+        scanned = 0
+        stack = [folder]
+        while stack:
+            current = stack.pop()
+            scanned += 1
+            stack.extend(self._scan_one(current))
+        self._conn.commit()
+        return scanned
+
+    def _scan_folder(self, folder: str) -> int:
+        """Rescan a folder that changed; new subfolders are scanned in full, vanished ones dropped"""
+        known = {f for f in self._mtimes if f.rpartition("/")[0] == folder and f != folder}
+        subdirs = self._scan_one(folder)
+        scanned = 1
+        for subdir in set(subdirs) - known:
+            scanned += self._scan_tree(subdir)
+        for subdir in known - set(subdirs):
+            self._drop_folder(subdir)
+        return scanned
+
+    def _scan_one(self, folder: str):
+        """List one folder into the store. Returns its subfolders."""
+        path = self._path(folder)
+        previous = self._load(folder).entries if folder in self._mtimes else {}
+        entries = []
+        subdirs = []
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(_join(folder, entry.name))
+                            continue
+                        size = entry.stat().st_size
+                    except OSError:
+                        continue
+                    # Keep a known capture time while the file looks the same
+                    old = previous.get(entry.name)
+                    entries.append((entry.name, size, old[1] if old and old[0] == size else None))
+        except OSError:
+            self._drop_folder(folder)
+            return []
+
+        self._conn.execute("DELETE FROM library_files WHERE root = ? AND folder = ?", (self._key, folder))
+        self._conn.executemany(
+            "INSERT INTO library_files VALUES (?, ?, ?, ?, ?)",
+            [(self._key, folder, name, size, taken) for name, size, taken in entries],
+        )
+        self._conn.execute("INSERT OR REPLACE INTO library_folders VALUES (?, ?, ?)", (self._key, folder, mtime_ns))
+        self._mtimes[folder] = mtime_ns
+        # Loaded again from the store if a run needs it; a full build
+        # shouldn't hold the whole tree in memory
+        self._loaded.pop(folder, None)
+        return subdirs
+
+    def _drop_folder(self, folder: str):
+        """Forget a folder and everything below it"""
+        prefix = f"{folder}/" if folder else ""
+        for known in [f for f in self._mtimes if f == folder or f.startswith(prefix)]:
+            self._mtimes.pop(known, None)
+            self._loaded.pop(known, None)
+            self._touched.discard(known)
+            self._conn.execute("DELETE FROM library_files WHERE root = ? AND folder = ?", (self._key, known))
+            self._conn.execute("DELETE FROM library_folders WHERE root = ? AND folder = ?", (self._key, known))
+
+    def _load(self, folder: str) -> _Folder:
+        loaded = self._loaded.get(folder)
+        if loaded is None:
+            rows = self._conn.execute(
+                "SELECT name, size, taken FROM library_files WHERE root = ? AND folder = ?", (self._key, folder)
+            )
+            loaded = self._loaded[folder] = _Folder((name, (size, taken)) for name, size, taken in rows)
+        return loaded
+
+    def contains(self, path: Path) -> bool:
+        """
+        Whether a file or folder exists at path. Paths outside the tree, or
+        in folders the index doesn't know, are checked on disk.
+        """
+        split = self._split(path)
+        if split is None:
+            return Path(path).exists()
+        folder, name = split
+        with self._lock:
+            if folder not in self._mtimes:
+                return Path(path).exists()
+            return _join(folder, name) in self._mtimes or name in self._load(folder).entries
+
+    def has_folder(self, path: Path) -> bool:
+        split = self._split(path)
+        if split is None:
+            return Path(path).is_dir()
+        with self._lock:
+            return _join(*split) in self._mtimes
+
+    def make_folder(self, path: Path):
+        """mkdir -p that skips the file system when the folder is already known"""
+        if self.has_folder(path):
+            return
+        split = self._split(path)
+        if split is None:
+            Path(path).mkdir(parents=True, exist_ok=True)
+            return
+        parts = _join(*split).split("/")
+        with self._lock:
+            # Note which levels are on disk before creating the rest; only
+            # folders made here are known to be empty
+            existed = {}
+            for depth in range(len(parts) + 1):
+                folder = "/".join(parts[:depth])
+                if folder not in self._mtimes:
+                    existed[folder] = self._path(folder).is_dir()
+            Path(path).mkdir(parents=True, exist_ok=True)
+            for depth in range(len(parts) + 1):
+                folder = "/".join(parts[:depth])
+                if folder in existed and folder not in self._mtimes:
+                    if existed[folder]:
+                        # Already there but never indexed: it may hold
+                        # files; the scan takes in the folders below too
+                        self._scan_tree(folder)
+                    else:
+                        self._mtimes[folder] = 0
+                        self._loaded[folder] = _Folder(())
+                # Creating a folder changes its parent's mtime too
+                self._touched.add(folder)
+
+    def find_same(self, target: Path, size: int, taken, read_taken=None):
+        """
+        An indexed file that looks like the one about to be written to
+        target: the target itself or one of its " (n)" variants, with the
+        same size and capture time. Same-size candidates whose capture time
+        isn't indexed yet are read with read_taken(path) and the result kept;
+        without read_taken they never match. Returns its path or None.
+        """
+        split = self._split(target)
+        if split is None:
+            return None
+        folder, name = split
+        with self._lock:
+            if folder not in self._mtimes:
+                return None
+            loaded = self._load(folder)
+            unknown = []
+            for candidate in loaded.families.get(name_family(name), ()):
+                candidate_size, candidate_taken = loaded.entries[candidate]
+                if candidate_size != size:
+                    continue
+                if candidate_taken is None:
+                    unknown.append(candidate)
+                elif taken is None or candidate_taken == taken:
+                    return target.with_name(candidate)
+        if read_taken is None:
+            return None
+
+        # The exact name first, it is the likeliest match
+        unknown.sort(key=lambda candidate: candidate != name)
+        for candidate in unknown:
+            candidate_taken = read_taken(target.with_name(candidate))
+            if candidate_taken is None:
+                continue
+            self.record(target.with_name(candidate), size, candidate_taken)
+            if taken is None or candidate_taken == taken:
+                return target.with_name(candidate)
+        return None
+
+    def record(self, path: Path, size: int, taken=None):
+        """Note a file the engine has just written"""
+        split = self._split(path)
+        if split is None:
+            return
+        folder, name = split
+        with self._lock:
+            if folder not in self._mtimes:
+                return
+            self._load(folder).add(name, size, taken)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO library_files VALUES (?, ?, ?, ?, ?)", (self._key, folder, name, size, taken)
+            )
+            self._touched.add(folder)
+
+    def commit(self):
+        """
+        Save recorded writes. The folders written to get their new mtime,
+        so the engine's own changes don't count as drift next time.
+        """
+        with self._lock:
+            for folder in self._touched:
+                if folder not in self._mtimes:
+                    continue
+                try:
+                    mtime_ns = os.stat(self._path(folder)).st_mtime_ns
+                except OSError:
+                    continue
+                self._mtimes[folder] = mtime_ns
+                self._conn.execute("INSERT OR REPLACE INTO library_folders VALUES (?, ?, ?)",
+                                   (self._key, folder, mtime_ns))
+            self._touched.clear()
+            self._conn.commit()
+
+    def close(self):
+        self.commit()
+        with self._lock:
+            self._conn.close()
@@ -26,6 +26,7 @@ gi.require_version('Adw', '1')
 from gi.repository import Gtk, Gio, Adw
 from .window import PhotoOrganizerWindow
 from .preferences import PhotoOrganizerPreferences
+from .service import OrganizerService, SERVICE_IDLE_TIMEOUT_MS
 
 
 class PhotoOrganizerApplication(Adw.Application):
@@ -39,6 +40,35 @@ class PhotoOrganizerApplication(Adw.Application):
         self.create_action('about', self.on_about_action)
         self.create_action('preferences', self.on_preferences_action)
 
+        # Job queue shared by the GUI and D-Bus clients
+        self.service = OrganizerService(self)
+
+        # I/O limits and report settings follow GSettings, including while a job is running
+        self.settings = Gio.Settings.new('com.thecirculark.photoorganizer')
+        self.settings.connect('changed', self.on_settings_changed)
+        self.service.apply_settings(self.settings)
+
+    def on_settings_changed(self, settings, key):
+        if key.startswith('io-') or key == 'report-textfile':
+            self.service.apply_settings(settings)
+
+    def do_startup(self):
+        Adw.Application.do_startup(self)
+        if self.get_flags() & Gio.ApplicationFlags.IS_SERVICE:
+            # Started by D-Bus activation: keep the caches warm for a while
+            # after the last job. A GUI launch exits with its last window.
+            self.set_inactivity_timeout(SERVICE_IDLE_TIMEOUT_MS)
+
+    def do_dbus_register(self, connection, object_path):
+        """Export the organizer interface next to the application's own"""
+        Adw.Application.do_dbus_register(self, connection, object_path)
+        self.service.register(connection, object_path)
+        return True
+
+    def do_dbus_unregister(self, connection, object_path):
+        self.service.unregister(connection)
+        Adw.Application.do_dbus_unregister(self, connection, object_path)
+
     def do_activate(self):
         """Called when the application is activated.
 
@@ -0,0 +1,80 @@
+# metrics.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import threading
+import time
+
+class RunMetrics:
+    """
+    Thread-safe counters and gauges for a single run.
+
+    Counters only go up (files read, bytes copied, ...); gauges hold the
+    latest value of a setting or level (current rate limit, ...).
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.finished = None
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set(self, name: str, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str, default=0):
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name]
+            return self._gauges.get(name, default)
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "elapsed_seconds": round(self.elapsed, 3),
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+
+    def summary_lines(self):
+        snapshot = self.snapshot()
+        lines = [f"Elapsed: {snapshot['elapsed_seconds']:.1f}s"]
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name}: {_format_value(value)}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"{name}: {_format_value(value)}")
+        return lines
+
+def _format_value(value):
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
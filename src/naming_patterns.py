@@ -17,9 +17,126 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import re
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
+# Burst sequence token - numbers photos that would otherwise get the same name
+SEQ_TOKEN = "SEQ"
+
+def format_sequence(sequence: int) -> str:
+    return f"{sequence:02d}"
+
+# Tokens that need more than the capture time, and the metadata field each reads.
+# "counter" is the camera's file counter from the source name (DSC_0042 -> 0042).
+METADATA_TOKENS = {
+    "CAMERA": "model",
+    "LENS": "lens_model",
+    "NUM": "counter",
+}
+UNKNOWN_VALUE = "Unknown"
+
+FILENAME_TOKENS = ['YYYY', 'YY', 'MM', 'DD', 'HH', 'mm', 'ss', 'MS', SEQ_TOKEN, *METADATA_TOKENS, 'ext']
+FOLDER_TOKENS = ['YYYY', 'YY', 'MM', 'DD', 'Month', 'Mon', *METADATA_TOKENS]
+
+def _metadata_value(metadata, field):
+    # Values come from the files themselves: never let one name a parent
+    # folder or split into more than one path part
+    value = str((metadata or {}).get(field) or "").replace("\0", "").replace("/", "-").strip()
+    if value in ("", ".", ".."):
+        return UNKNOWN_VALUE
+    return value
+
+_TOKEN_VALUES = {
+    'YYYY': lambda dt, ms, ext, meta, seq: f"{dt.year:04d}",
+    'YY': lambda dt, ms, ext, meta, seq: f"{dt.year:02d}",
+    'MM': lambda dt, ms, ext, meta, seq: f"{dt.month:02d}",
+    'DD': lambda dt, ms, ext, meta, seq: f"{dt.day:02d}",
+    'HH': lambda dt, ms, ext, meta, seq: f"{dt.hour:02d}",
+    'mm': lambda dt, ms, ext, meta, seq: f"{dt.minute:02d}",
+    'ss': lambda dt, ms, ext, meta, seq: f"{dt.second:02d}",
+    'MS': lambda dt, ms, ext, meta, seq: ms,
+    'Month': lambda dt, ms, ext, meta, seq: dt.strftime('%B'),
+    'Mon': lambda dt, ms, ext, meta, seq: dt.strftime('%b'),
+    # Without a sequence number SEQ stays in place so equal names can be grouped
+    SEQ_TOKEN: lambda dt, ms, ext, meta, seq: SEQ_TOKEN if seq is None else format_sequence(seq),
+    'ext': lambda dt, ms, ext, meta, seq: ext,
+}
+for _token, _field in METADATA_TOKENS.items():
+    _TOKEN_VALUES[_token] = lambda dt, ms, ext, meta, seq, _field=_field: _metadata_value(meta, _field)
+
+# What each token's value can look like in a rendered name, for parse()
+_TOKEN_PATTERNS = {
+    'YYYY': r"\d{4}",
+    'YY': r"\d{2}",
+    'MM': r"\d{2}",
+    'DD': r"\d{2}",
+    'HH': r"\d{2}",
+    'mm': r"\d{2}",
+    'ss': r"\d{2}",
+    'MS': r"\d{3}",
+    'Month': r"[^/]+?",
+    'Mon': r"[^/]+?",
+    SEQ_TOKEN: r"\d+",
+    'ext': r"\.[^./]*",
+    'CAMERA': r"[^/]+?",
+    'LENS': r"[^/]+?",
+    'NUM': rf"\d+|{UNKNOWN_VALUE}",
+}
+
+class CompiledPattern:
+    """
+    A naming pattern split into literal text and tokens once, up front.
+
+    Tokens are matched longest first in a single pass, so values that happen
+    to contain token text (a lens called "24-70mm") are never replaced again.
+    `fields` is the set of metadata fields the pattern needs beyond the
+    capture time, which lets the extractor skip every other tag.
+    """
+
+    def __init__(self, pattern: str, is_filename: bool = True):
+        tokens = FILENAME_TOKENS if is_filename else FOLDER_TOKENS
+        alternatives = "|".join(re.escape(token) for token in sorted(tokens, key=len, reverse=True))
+
+        self.pattern = pattern
+        # Odd positions hold tokens, even positions literal text
+        self.parts = re.split(f"({alternatives})", pattern)
+        self.tokens = frozenset(self.parts[1::2])
+        self.fields = frozenset(METADATA_TOKENS[token] for token in self.tokens if token in METADATA_TOKENS)
+        self.append_extension = is_filename and 'ext' not in pattern
+        self._regex = None
+
+    def render(self, dt: datetime, milliseconds: str = "000", extension: str = "", metadata=None, sequence=None) -> str:
+        parts = list(self.parts)
+        for i in range(1, len(parts), 2):
+            parts[i] = _TOKEN_VALUES[parts[i]](dt, milliseconds, extension, metadata, sequence)
+
+        result = "".join(parts)
+        if self.append_extension and extension:
+            result += extension
+        return result
+
+    def parse(self, name: str):
+        """
+        The text each token stands for in a name this pattern rendered, as
+        {token: text}, or None when name doesn't fit the pattern
+        """
+        if self._regex is None:
+            regex = "".join(re.escape(part) if i % 2 == 0 else f"({_TOKEN_PATTERNS[part]})"
+                            for i, part in enumerate(self.parts))
+            if self.append_extension:
+                regex += r"(?:\.[^./]*)?"
+            self._regex = re.compile(regex)
+        match = self._regex.fullmatch(name)
+        if match is None:
+            return None
+        return dict(zip(self.parts[1::2], match.groups()))
+
+@lru_cache(maxsize=64)
+def compile_pattern(pattern: str, is_filename: bool = True) -> CompiledPattern:
+    return CompiledPattern(pattern, is_filename)
+
 # Filename pattern presets
 FILENAME_PRESETS = {
     "YYYYMMDD-HHmmss-MS": "YYYYMMDD-HHmmss-MS",
@@ -27,6 +144,7 @@ FILENAME_PRESETS = {
     "YYYY-MM-DD_HH.mm.ss": "YYYY-MM-DD_HH.mm.ss",
     "YYYYMMDD_HHmmss": "YYYYMMDD_HHmmss",
     "IMG_YYYYMMDD_HHmmss": "IMG_YYYYMMDD_HHmmss",
+    "YYYYMMDD_HHmmss_SEQ": "YYYYMMDD_HHmmss_SEQ",
     "Photo_YYYY-MM-DD": "Photo_YYYY-MM-DD",
 }
 
@@ -48,7 +166,7 @@ class NamingPatterns:
         self.filename_pattern = "YYYYMMDD-HHmmss-MS"
         self.folder_pattern = "YYYY/MM-Month"
 
-    def generate_filename(self, dt: datetime, milliseconds: str, extension: str, pattern: str = None) -> str:
+    def generate_filename(self, dt: datetime, milliseconds: str, extension: str, pattern: str = None, sequence: int = 1, metadata=None) -> str:
         """
         Generate filename based on pattern
 
@@ -61,36 +179,18 @@ class NamingPatterns:
         - mm: 2-digit minute
         - ss: 2-digit second
         - MS: milliseconds (3 digits)
+        - SEQ: position within a burst of photos with the same name (2 digits)
+        - CAMERA: camera model
+        - LENS: lens model
+        - NUM: file counter from the original name
         - ext: file extension
         """
         if pattern is None:
             pattern = self.filename_pattern
 
-        # Create replacement mapping
-        replacements = {
-            'YYYY': f"{dt.year:04d}",
-            'MM': f"{dt.month:02d}",
-            'DD': f"{dt.day:02d}",
-            'HH': f"{dt.hour:02d}",
-            'mm': f"{dt.minute:02d}",
-            'ss': f"{dt.second:02d}",
-            'MS': milliseconds,
-            'YY': f"{dt.year:02d}",
-            'ext': extension,
-        }
-
-        # Apply replacements - sort tokens by length (longest first) to prevent partial replacements
-        result = pattern
-        for token in sorted(replacements.keys(), key=len, reverse=True):
-            result = result.replace(token, replacements[token])
-
-        # If pattern doesn't include ext token, append the extension
-        if 'ext' not in pattern and extension:
-            result += extension
-
-        return result
+        return compile_pattern(pattern, True).render(dt, milliseconds, extension, metadata, sequence)
 
-    def generate_folder_path(self, dt: datetime, pattern: str = None) -> str:
+    def generate_folder_path(self, dt: datetime, pattern: str = None, metadata=None) -> str:
         """
         Generate folder path based on pattern
 
@@ -101,26 +201,14 @@ class NamingPatterns:
         - DD: 2-digit day
         - Month: Full month name (January, February, etc.)
         - Mon: 3-letter month abbreviation (Jan, Feb, etc.)
+        - CAMERA: camera model
+        - LENS: lens model
+        - NUM: file counter from the original name
         """
         if pattern is None:
             pattern = self.folder_pattern
 
-        # Create replacement mapping - order matters! Replace longer tokens first
-        replacements = {
-            'Month': dt.strftime('%B'),
-            'YYYY': f"{dt.year:04d}",
-            'MM': f"{dt.month:02d}",
-            'DD': f"{dt.day:02d}",
-            'Mon': dt.strftime('%b'),
-            'YY': f"{dt.year:02d}",
-        }
-
-        # Apply replacements - sort tokens by length (longest first) to prevent partial replacements
-        result = pattern
-        for token in sorted(replacements.keys(), key=len, reverse=True):
-            result = result.replace(token, replacements[token])
-
-        return result
+        return compile_pattern(pattern, False).render(dt, metadata=metadata)
 
     def validate_pattern(self, pattern: str, is_filename: bool = True) -> tuple[bool, str]:
         """
@@ -140,13 +228,9 @@ class NamingPatterns:
                 return False, f"Pattern contains invalid character: {char}"
 
         # Check for valid tokens
-        if is_filename:
-            valid_tokens = ['YYYY', 'YY', 'MM', 'DD', 'HH', 'mm', 'ss', 'MS', 'ext']
-        else:
-            valid_tokens = ['YYYY', 'YY', 'MM', 'DD', 'Month', 'Mon']
+        valid_tokens = FILENAME_TOKENS if is_filename else FOLDER_TOKENS
 
         # Extract tokens from pattern (handle both uppercase and lowercase)
-        import re
         tokens = re.findall(r'[A-Za-z]+', pattern)
 
         invalid_tokens = [token for token in tokens if token not in valid_tokens]
@@ -165,12 +249,17 @@ class NamingPatterns:
 • mm - 2-digit minute (00-59)
 • ss - 2-digit second (00-59)
 • MS - milliseconds (000-999)
+• SEQ - burst sequence number (01, 02, ...)
+• CAMERA - camera model (Canon EOS R6)
+• LENS - lens model (RF24-105mm F4 L IS USM)
+• NUM - file counter from the original name (0042)
 • ext - file extension (.jpg)
 
 Examples:
 • YYYYMMDD-HHmmss-MS → 20250115-143025-123.jpg
 • YYYY-MM-DD_HH.mm.ss → 2025-01-15_14.30.25.jpg
-• IMG_YYYYMMDD_HHmmss → IMG_20250115_143025.jpg"""
+• IMG_YYYYMMDD_HHmmss → IMG_20250115_143025.jpg
+• YYYYMMDD_HHmmss_SEQ → 20250115_143025_01.jpg"""
 
     def get_directory_pattern_help(self) -> str:
         """Get help text for pattern tokens"""
@@ -182,10 +271,14 @@ Examples:
 • DD - 2-digit day (01-31)
 • Month - Full month name (January)
 • Mon - 3-letter month (Jan)
+• CAMERA - camera model (Canon EOS R6)
+• LENS - lens model (RF24-105mm F4 L IS USM)
+• NUM - file counter from the original name (0042)
 
 Examples:
 • YYYY/MM → 2025/01
 • YYYY/MM-Month → 2025/01-January
 • YYYY/MM Month → 2025/01 January
-• Photos/YYYY/MM → Photos/2025/01"""
+• Photos/YYYY/MM → Photos/2025/01
+• CAMERA/YYYY/MM → Canon EOS R6/2025/01"""
 
@@ -0,0 +1,304 @@
+# plan_view.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from exif import Image
+from gi.repository import Adw, Gdk, Gio, GLib, GObject, Gtk, Pango
+from .run_log import RunLog
+
+FILTER_ALL = 0
+FILTER_SKIPS = 1
+FILTER_COLLISIONS = 2
+
+THUMBNAIL_SIZE = 48
+THUMBNAIL_CACHE_SIZE = 512
+THUMBNAIL_WORKERS = 2
+# The EXIF APP1 segment (and so its thumbnail) lives in the first 64 KiB of a JPEG
+THUMBNAIL_READ_BYTES = 128 * 1024
+FLUSH_INTERVAL_MS = 100
+
+def read_embedded_thumbnail(path: str):
+    """Return the EXIF thumbnail JPEG bytes without decoding the full image"""
+    with open(path, "rb") as f:
+        head = f.read(THUMBNAIL_READ_BYTES)
+    return Image(head).get_thumbnail()
+
+class ThumbnailLoader:
+    """Loads embedded thumbnails on a small background pool into an LRU cache"""
+
+    def __init__(self, capacity: int = THUMBNAIL_CACHE_SIZE, workers: int = THUMBNAIL_WORKERS):
+        self.capacity = capacity
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+
+    def lookup(self, path: str):
+        """Returns (found, texture). A cached None means the file has no thumbnail."""
+        with self._lock:
+            if path in self._cache:
+                self._cache.move_to_end(path)
+                return True, self._cache[path]
+        return False, None
+
+    def request(self, path: str, callback):
+        """Load `path` in the background and call `callback(path, texture)` on the main loop"""
+        return self._pool.submit(self._load, path, callback)
+
+    def _load(self, path: str, callback):
+        try:
+            texture = Gdk.Texture.new_from_bytes(GLib.Bytes.new(read_embedded_thumbnail(path)))
+        except Exception:
+            texture = None
+
+        with self._lock:
+            self._cache[path] = texture
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+
+        GLib.idle_add(callback, path, texture)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+class PlanItem(GObject.Object):
+    """Row object for one planned action. Only created for rows being shown."""
+
+    def __init__(self, entry):
+        super().__init__()
+        self.entry = entry
+
+    @GObject.Property(type=str)
+    def source(self):
+        return self.entry.source
+
+    @GObject.Property(type=str)
+    def target(self):
+        return self.entry.target
+
+    @GObject.Property(type=str)
+    def reason(self):
+        return self.entry.reason
+
+class PlanModel(GObject.Object, Gio.ListModel):
+    """
+    List model over plain PlanEntry tuples.
+
+    Entries are kept as tuples and wrapped in a PlanItem only when the list
+    view asks for a row. Filters are positional indexes maintained as
+    entries arrive, so switching filter never touches every row.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._entries = []
+        self._skips = array("L")
+        self._collisions = array("L")
+        self._filter = FILTER_ALL
+
+    def do_get_item_type(self):
+        return PlanItem.__gtype__
+
+    def do_get_n_items(self):
+        return len(self._visible())
+
+    def do_get_item(self, position):
+        visible = self._visible()
+        if position >= len(visible):
+            return None
+        if visible is self._entries:
+            return PlanItem(self._entries[position])
+        return PlanItem(self._entries[visible[position]])
+
+    def _visible(self):
+        if self._filter == FILTER_SKIPS:
+            return self._skips
+        if self._filter == FILTER_COLLISIONS:
+            return self._collisions
+        return self._entries
+
+    def extend(self, entries):
+        old_count = self.do_get_n_items()
+        for entry in entries:
+            position = len(self._entries)
+            self._entries.append(entry)
+            if entry.action != "move":
+                self._skips.append(position)
+            if entry.collision:
+                self._collisions.append(position)
+
+        added = self.do_get_n_items() - old_count
+        if added:
+            self.items_changed(old_count, 0, added)
+
+    def set_filter(self, mode: int):
+        if mode == self._filter:
+            return
+        old_count = self.do_get_n_items()
+        self._filter = mode
+        self.items_changed(0, old_count, self.do_get_n_items())
+
+    def counts(self):
+        return len(self._entries), len(self._skips), len(self._collisions)
+
+@Gtk.Template(resource_path='/com/thecirculark/photoorganizer/ui/po_plan_window.ui')
+class PoPlanWindow(Adw.ApplicationWindow):
+    __gtype_name__ = "PoPlanWindow"
+
+    column_view = Gtk.Template.Child()
+    filter_dropdown = Gtk.Template.Child()
+    summary_label = Gtk.Template.Child()
+    save_button = Gtk.Template.Child()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self.start_time = datetime.now()
+        self.run_log = RunLog.from_settings(self.start_time)
+        self.model = PlanModel()
+        self.thumbnails = ThumbnailLoader()
+
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._finished = False
+
+        self.column_view.set_model(Gtk.NoSelection.new(self.model))
+        self._add_column("", self._setup_thumbnail, self._bind_thumbnail, self._unbind_thumbnail)
+        self._add_column("Source", self._setup_label, self._bind_label("source"), expand=True)
+        self._add_column("Target", self._setup_label, self._bind_label("target"), expand=True)
+        self._add_column("Reason", self._setup_label, self._bind_label("reason"))
+
+        self.filter_dropdown.connect("notify::selected", self.on_filter_changed)
+        self.save_button.connect("clicked", self.on_save_clicked)
+        self.connect("close-request", self.on_close_request)
+
+        self.run_log.write(f"Dry run started: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        GLib.timeout_add(FLUSH_INTERVAL_MS, self._flush_pending)
+
+    def log(self, message: str):
+        self.run_log.write(message)
+
+    def plan(self, entry):
+        """Called from the worker thread for every planned action"""
+        with self._pending_lock:
+            self._pending.append(entry)
+
+    def log_end(self, job=None):
+        end_time = datetime.now()
+        self.run_log.write(f"Dry run finished: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        self.run_log.write(f"Total time taken: {end_time - self.start_time}")
+        if job:
+            for line in job.metrics.summary_lines():
+                self.run_log.write(line)
+        self.run_log.close()
+        self._finished = True
+
+    def _flush_pending(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+
+        if pending:
+            self.model.extend(pending)
+            total, skips, collisions = self.model.counts()
+            self.summary_label.set_text(f"{total} files · {skips} skipped · {collisions} collisions")
+
+        return GLib.SOURCE_CONTINUE if not self._finished or pending else GLib.SOURCE_REMOVE
+
+    def _add_column(self, title, setup, bind, unbind=None, expand=False):
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", setup)
+        factory.connect("bind", bind)
+        if unbind:
+            factory.connect("unbind", unbind)
+
+        column = Gtk.ColumnViewColumn.new(title, factory)
+        column.set_expand(expand)
+        column.set_resizable(True)
+        self.column_view.append_column(column)
+
+    def _setup_label(self, factory, list_item):
+        label = Gtk.Label(xalign=0, ellipsize=Pango.EllipsizeMode.MIDDLE)
+        list_item.set_child(label)
+
+    def _bind_label(self, field):
+        def bind(factory, list_item):
+            list_item.get_child().set_text(getattr(list_item.get_item().entry, field))
+        return bind
+
+    def _setup_thumbnail(self, factory, list_item):
+        picture = Gtk.Picture(content_fit=Gtk.ContentFit.COVER)
+        picture.set_size_request(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        picture.path = None
+        picture.future = None
+        list_item.set_child(picture)
+
+    def _bind_thumbnail(self, factory, list_item):
+        picture = list_item.get_child()
+        path = list_item.get_item().entry.source
+        picture.path = path
+
+        found, texture = self.thumbnails.lookup(path)
+        picture.set_paintable(texture)
+        if not found:
+            picture.future = self.thumbnails.request(path, self._on_thumbnail_loaded(picture))
+
+    def _unbind_thumbnail(self, factory, list_item):
+        picture = list_item.get_child()
+        if picture.future is not None:
+            # Rows scrolled past before their turn never hit the disk
+            picture.future.cancel()
+            picture.future = None
+        picture.path = None
+        picture.set_paintable(None)
+
+    def _on_thumbnail_loaded(self, picture):
+        def callback(path, texture):
+            if picture.path == path:
+                picture.future = None
+                picture.set_paintable(texture)
+            return GLib.SOURCE_REMOVE
+        return callback
+
+    def on_filter_changed(self, dropdown, _):
+        self.model.set_filter(dropdown.get_selected())
+
+    def on_save_clicked(self, button):
+        dialog = Gtk.FileDialog()
+        dialog.set_title("Save Log File")
+        filename = f"photo_organizer_dry_run_{self.start_time.strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+        dialog.set_initial_name(filename)
+
+        dialog.save(self, None, self.on_save_finished)
+
+    def on_save_finished(self, dialog, result):
+        try:
+            file = dialog.save_finish(result)
+            if file:
+                self.run_log.export(Path(file.get_path()))
+        except GLib.Error:
+            pass
+
+    def on_close_request(self, window):
+        self.thumbnails.shutdown()
+        return False
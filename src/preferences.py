@@ -34,11 +34,15 @@ class PhotoOrganizerPreferences(Adw.PreferencesDialog):
     folder_entry = Gtk.Template.Child()
     folder_preview = Gtk.Template.Child()
 
+    # Diagnostics widgets
+    profile_switch = Gtk.Template.Child()
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
         self.naming_patterns = NamingPatterns()
         self.settings = Gio.Settings.new('com.thecirculark.photoorganizer')
+        self.settings.bind('profile-runs', self.profile_switch, 'active', Gio.SettingsBindFlags.DEFAULT)
 
         try:
             self._setup_filename_patterns()
@@ -157,6 +161,7 @@ class PhotoOrganizerPreferences(Adw.PreferencesDialog):
         # Sample datetime for preview
         sample_dt = datetime(2025, 1, 15, 14, 30, 25)
         sample_ms = "123"
+        sample_metadata = {"model": "Canon EOS R6", "lens_model": "RF24-105mm F4 L IS USM", "counter": "0042"}
 
         filename_pattern = self.filename_entry.get_text()
         folder_pattern = self.folder_entry.get_text()
@@ -164,7 +169,7 @@ class PhotoOrganizerPreferences(Adw.PreferencesDialog):
         try:
             # Always use the pattern from entry field and add .jpg extension for preview
             filename_preview = self.naming_patterns.generate_filename(
-                sample_dt, sample_ms, ".jpg", filename_pattern
+                sample_dt, sample_ms, ".jpg", filename_pattern, metadata=sample_metadata
             )
             self.filename_preview.set_text(filename_preview)
         except Exception as e:
@@ -172,7 +177,7 @@ class PhotoOrganizerPreferences(Adw.PreferencesDialog):
 
         try:
             folder_preview = self.naming_patterns.generate_folder_path(
-                sample_dt, folder_pattern
+                sample_dt, folder_pattern, metadata=sample_metadata
             )
             self.folder_preview.set_text(folder_preview)
         except Exception as e:
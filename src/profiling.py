@@ -0,0 +1,252 @@
+# profiling.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+SAMPLE_INTERVAL = 0.005
+TOP_ALLOCATIONS = 25
+MAX_TIMELINE = 10_000
+# Only snapshot the heap again once it has grown this much past the last snapshot
+SNAPSHOT_GROWTH = 1.10
+
+class SyscallCounter:
+    """
+    Counts the engine's file system calls while active.
+
+    The engine makes its stat, open, rename, scandir, mkdir and unlink calls
+    through small wrappers (see utils) that report each one with
+    count_syscall, so calls made by anything else in the process, the GUI
+    included, are never counted.
+    """
+
+    _active = None
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def start(self):
+        SyscallCounter._active = self
+
+    def stop(self):
+        if SyscallCounter._active is self:
+            SyscallCounter._active = None
+
+def count_syscall(name: str):
+    """Note one file system call for the run being profiled, if any"""
+    counter = SyscallCounter._active
+    if counter is not None:
+        counter.add(name)
+
+class SamplingProfiler:
+    """Samples the stacks of every thread on a timer and keeps them as folded stacks"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                calls = []
+                while frame is not None:
+                    code = frame.f_code
+                    calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                calls.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(calls))] += 1
+
+    def write(self, path: Path):
+        """Write folded stacks, as read by flamegraph.pl and speedscope"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class RunProfiler:
+    """
+    Profiles one organize run and writes the results next to its run log.
+
+    mode picks the CPU profiler: "cprofile" traces the thread that calls
+    start() (the job's worker) and every pool thread that calls
+    thread_started(), "sampling" samples every thread. Either way,
+    tracemalloc follows the heap at the stage boundaries handle_files marks,
+    and file system calls are counted. For a run log at run_x.log the
+    artifacts are run_x.prof (or run_x.folded for sampling) and
+    run_x.profile.json.
+    """
+
+    def __init__(self, mode: str, artifact_path: Path):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.artifact_path = Path(artifact_path)
+        self.artifacts = []
+        self.syscalls = SyscallCounter()
+        self._cprofile = None
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._started = None
+        self._last_mark = None
+        self._stage_seconds = Counter()
+        self._timeline = []
+        self._start_snapshot = None
+        self._peak_snapshot = None
+        self._peak_size = 0
+        self._traced_memory = False
+
+    def start(self):
+        self._started = self._last_mark = time.monotonic()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._traced_memory = True
+        self._start_snapshot = tracemalloc.take_snapshot()
+        self.syscalls.start()
+        if self.mode == "cprofile":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            self._sampler = SamplingProfiler()
+            self._sampler.start()
+
+    def thread_started(self):
+        """Called in each metadata/transfer thread as the run starts it"""
+        if self._cprofile is None:
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12 and later: the run's profiler already sees every thread
+            return
+        with self._lock:
+            self._thread_profiles.append(profile)
+
+    def mark(self, stage: str, where: str = ""):
+        """Called as each stage finishes: charges it the time since the last mark and checks the heap"""
+        now = time.monotonic()
+        self._stage_seconds[stage] += now - self._last_mark
+        self._last_mark = now
+
+        current, peak = tracemalloc.get_traced_memory()
+        if len(self._timeline) < MAX_TIMELINE:
+            self._timeline.append({
+                "seconds": round(now - self._started, 4),
+                "stage": stage,
+                "where": where,
+                "current_bytes": current,
+                "peak_bytes": peak,
+            })
+        if current > self._peak_size * SNAPSHOT_GROWTH:
+            self._peak_size = current
+            self._peak_snapshot = tracemalloc.take_snapshot()
+
+    def stop(self):
+        """Stop profiling and write the artifacts. Returns their paths."""
+        self.mark("end")
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.syscalls.stop()
+
+        end_snapshot = tracemalloc.take_snapshot()
+        if self._traced_memory:
+            tracemalloc.stop()
+
+        if self._cprofile is not None:
+            self._write_cprofile()
+        else:
+            path = self.artifact_path.with_suffix(".folded")
+            self._sampler.write(path)
+            self.artifacts.append(path)
+
+        peak = self._peak_snapshot or end_snapshot
+        report = {
+            "mode": self.mode,
+            "elapsed_seconds": round(time.monotonic() - self._started, 3),
+            "stage_seconds": {stage: round(seconds, 4) for stage, seconds in self._stage_seconds.items()},
+            "syscalls": dict(self.syscalls.counts),
+            "memory": {
+                "timeline": self._timeline,
+                "top_at_peak": [_format_stat(stat) for stat in peak.statistics("lineno")[:TOP_ALLOCATIONS]],
+                "top_growth": [_format_stat(stat) for stat in
+                               end_snapshot.compare_to(self._start_snapshot, "lineno")[:TOP_ALLOCATIONS]],
+            },
+        }
+        path = self.artifact_path.with_suffix(".profile.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        self.artifacts.append(path)
+        return self.artifacts
+
+    def _write_cprofile(self):
+        # The pool threads have finished by now; merge what they recorded
+        stats = pstats.Stats(self._cprofile)
+        for profile in self._thread_profiles:
+            stats.add(profile)
+        path = self.artifact_path.with_suffix(".prof")
+        stats.dump_stats(path)
+        self.artifacts.append(path)
+
+        # A readable summary next to the binary stats
+        summary = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats("cumulative").print_stats(50)
+        text_path = self.artifact_path.with_suffix(".prof.txt")
+        text_path.write_text(summary.getvalue(), encoding="utf-8")
+        self.artifacts.append(text_path)
+
+def _format_stat(stat):
+    frame = stat.traceback[0]
+    entry = {"where": f"{frame.filename}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_bytes"] = stat.size_diff
+    return entry
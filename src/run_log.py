@@ -0,0 +1,171 @@
+# run_log.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import gzip
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from gi.repository import Gio
+from . import store
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+BUFFER_RECORDS = 256
+
+_run_ids = itertools.count()
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+class SegmentedFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    A RotatingFileHandler that never deletes: each full segment is moved
+    aside as path.1, path.2, ... in the order written, so a long run keeps
+    all of its log.
+    """
+
+    def __init__(self, filename, max_bytes: int, **kwargs):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=1, **kwargs)
+        self._segment = 0
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self._segment += 1
+        self.rotate(self.baseFilename, self.rotation_filename(f"{self.baseFilename}.{self._segment}"))
+        if not self.delay:
+            self.stream = self._open()
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, with any `fields` passed through `extra`"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+class RunLog:
+    """
+    Streams a run's log to disk as it happens.
+
+    Every run gets a plain text log and a JSON Lines log in the XDG state
+    dir. Both rotate by size; every segment is kept, optionally gzipped.
+    Records are buffered in memory and flushed in batches, on warnings, and
+    when the log is closed. Lines that carry a PlanEntry (see utils.LogLine)
+    get its fields in the JSON record, and failures are logged as warnings.
+    """
+
+    def __init__(self, start_time: datetime = None, log_dir: Path = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 compress: bool = False):
+        self.start_time = start_time or datetime.now()
+        self.log_dir = Path(log_dir) if log_dir else store.get_state_dir() / "logs"
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+
+        stem = f"run_{self.start_time.strftime('%Y-%m-%d_%H-%M-%S')}_{os.getpid()}_{next(_run_ids)}"
+        self.path = self.log_dir / f"{stem}.log"
+        self.jsonl_path = self.log_dir / f"{stem}.jsonl"
+
+        self._logger = logging.getLogger(f"photoorganizer.run.{stem}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+
+        self._handlers = []
+        for path, formatter in ((self.path, logging.Formatter("%(message)s")),
+                                (self.jsonl_path, JsonLinesFormatter())):
+            file_handler = SegmentedFileHandler(path, max_bytes, encoding="utf-8")
+            file_handler.setFormatter(formatter)
+            if compress:
+                file_handler.namer = lambda name: name + ".gz"
+                file_handler.rotator = _gzip_rotator
+
+            buffered = logging.handlers.MemoryHandler(
+                BUFFER_RECORDS, flushLevel=logging.WARNING, target=file_handler
+            )
+            self._logger.addHandler(buffered)
+            self._handlers.append((buffered, file_handler))
+
+    @classmethod
+    def from_settings(cls, start_time: datetime = None):
+        """Create a run log using the rotation settings from GSettings"""
+        settings = Gio.Settings.new('com.thecirculark.photoorganizer')
+        return cls(
+            start_time=start_time,
+            max_bytes=settings.get_int('log-max-size') * 1024 * 1024,
+            compress=settings.get_boolean('log-compress')
+        )
+
+    def write(self, message: str, level: int = logging.INFO, **fields):
+        """Log one line. Keyword arguments become fields of the JSON record."""
+        entry = getattr(message, "entry", None)
+        if entry is not None:
+            fields = {**entry._asdict(), **fields}
+            if entry.action == "error":
+                level = max(level, logging.WARNING)
+        self._logger.log(level, str(message), extra={"fields": fields})
+
+    def flush(self):
+        for buffered, _ in self._handlers:
+            buffered.flush()
+
+    def close(self):
+        for buffered, file_handler in self._handlers:
+            self._logger.removeHandler(buffered)
+            buffered.close()
+            file_handler.close()
+        # Don't let finished runs pile up in the logging registry
+        logging.Logger.manager.loggerDict.pop(self._logger.name, None)
+
+    def segments(self, path: Path = None):
+        """The on-disk pieces of a log, oldest first"""
+        path = Path(path or self.path)
+        rotated = []
+        for candidate in path.parent.glob(path.name + ".*"):
+            index = candidate.name[len(path.name) + 1:].removesuffix(".gz")
+            if index.isdigit():
+                rotated.append((int(index), candidate))
+        pieces = [p for _, p in sorted(rotated)]
+        if path.exists():
+            pieces.append(path)
+        return pieces
+
+    def export(self, dest: Path, path: Path = None):
+        """Copy the log to `dest`, stitching rotated segments back together"""
+        self.flush()
+        pieces = self.segments(path)
+
+        if len(pieces) == 1 and pieces[0].suffix != ".gz":
+            shutil.copyfile(pieces[0], dest)
+            return
+
+        with open(dest, "wb") as out:
+            for piece in pieces:
+                opener = gzip.open if piece.suffix == ".gz" else open
+                with opener(piece, "rb") as src:
+                    shutil.copyfileobj(src, out)
@@ -0,0 +1,208 @@
+# run_report.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import json
+import os
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from . import store
+
+REPORT_VERSION = 1
+# Reports kept in the history directory; older ones are pruned
+REPORT_HISTORY = 200
+TOP_ERRORS = 10
+
+STATUS_DONE = "done"
+STATUS_CANCELLED = "cancelled"
+STATUS_FAILED = "failed"
+
+def get_reports_dir() -> Path:
+    """Directory holding the report of every run, newest last"""
+    path = store.get_state_dir() / "reports"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def _error_kind(reason: str) -> str:
+    # "[Errno 13] Permission denied: '/a/b.jpg'" -> "[Errno 13] Permission denied"
+    return re.sub(r":? '[^']*'(?: -> '[^']*')?", "", reason).strip() or reason
+
+class RunReport:
+    """
+    Tallies the PlanEntry stream of one run into a structured report.
+
+    handle_files feeds every entry through record(); finish() adds the
+    byte counts and timings from the run's RunMetrics. The report is saved
+    as JSON in the reports directory and can also be exported in the
+    Prometheus textfile format for node_exporter.
+    """
+
+    def __init__(self, source: Path, destination: Path, rename: bool, organize: bool, dry_run: bool):
+        self.started = datetime.now()
+        self.data = {
+            "version": REPORT_VERSION,
+            "source": str(source),
+            "destination": str(destination) if organize else None,
+            "rename": rename,
+            "organize": organize,
+            "dry_run": dry_run,
+        }
+        self.moved = 0
+        self.collisions = 0
+        self.failed = 0
+        self.skipped = Counter()
+        self.errors = Counter()
+        self._error_examples = {}
+        self._lock = threading.Lock()
+
+    def recorder(self, planner=None):
+        """A planner callback that records each entry, then passes it on to planner"""
+        def record(entry):
+            self.record(entry)
+            if planner:
+                planner(entry)
+        return record
+
+    def record(self, entry):
+        with self._lock:
+            if entry.action == "move":
+                self.moved += 1
+                if entry.collision:
+                    self.collisions += 1
+            elif entry.action == "skip":
+                self.skipped[entry.reason] += 1
+            else:
+                self.failed += 1
+                kind = _error_kind(entry.reason)
+                self.errors[kind] += 1
+                self._error_examples.setdefault(kind, entry.source)
+
+    def finish(self, metrics, status: str = STATUS_DONE, error: str = None) -> dict:
+        """Complete the report from the run's metrics and return it"""
+        finished = datetime.now()
+        elapsed = metrics.elapsed
+        bytes_copied = metrics.get("bytes_copied")
+        with self._lock:
+            self.data.update({
+                "status": status,
+                "error": error,
+                "started": self.started.isoformat(timespec="seconds"),
+                "finished": finished.isoformat(timespec="seconds"),
+                "elapsed_seconds": round(elapsed, 3),
+                "files": {
+                    "seen": metrics.get("files_seen"),
+                    "moved": self.moved,
+                    "skipped": sum(self.skipped.values()),
+                    "collisions": self.collisions,
+                    "failed": self.failed,
+                },
+                "skipped_by_reason": dict(self.skipped),
+                "bytes": {
+                    "copied": bytes_copied,
+                    "metadata_read": metrics.get("metadata_bytes_read"),
+                },
+                "throughput": {
+                    "files_per_sec": round(self.moved / elapsed, 3) if elapsed > 0 else 0.0,
+                    "bytes_per_sec": round(bytes_copied / elapsed, 3) if elapsed > 0 else 0.0,
+                },
+                "throttle_wait_seconds": round(metrics.get("throttle_wait_seconds"), 3),
+                "top_errors": [
+                    {"error": kind, "count": count, "example": self._error_examples[kind]}
+                    for kind, count in self.errors.most_common(TOP_ERRORS)
+                ],
+                "metrics": metrics.snapshot(),
+            })
+        return self.data
+
+    def save(self, reports_dir: Path = None) -> Path:
+        """
+        Write the report to the history, noting how the previous comparable
+        run (same source, same kind of run) went, and prune old reports.
+        """
+        reports_dir = Path(reports_dir) if reports_dir else get_reports_dir()
+        reports_dir.mkdir(parents=True, exist_ok=True)
+
+        previous = _latest_matching(reports_dir, self.data["source"], self.data["dry_run"])
+        if previous:
+            self.data["previous"] = {
+                "started": previous.get("started"),
+                "elapsed_seconds": previous.get("elapsed_seconds"),
+                "files": previous.get("files"),
+                "throughput": previous.get("throughput"),
+            }
+
+        name = f"report_{self.started.strftime('%Y-%m-%d_%H-%M-%S')}_{os.getpid()}_{id(self):x}.json"
+        path = reports_dir / name
+        _write_atomic(path, json.dumps(self.data, indent=2))
+
+        for old in sorted(reports_dir.glob("report_*.json"))[:-REPORT_HISTORY]:
+            old.unlink(missing_ok=True)
+        return path
+
+    def write_textfile(self, path: Path):
+        """Export the report in the Prometheus textfile format, replacing path atomically"""
+        data = self.data
+        labels = f'source="{_escape_label(data["source"])}"'
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP photoorganizer_{name} {help_text}")
+            lines.append(f"# TYPE photoorganizer_{name} {kind}")
+            for extra, value in samples:
+                all_labels = labels + (f",{extra}" if extra else "")
+                lines.append(f"photoorganizer_{name}{{{all_labels}}} {value}")
+
+        files = data["files"]
+        metric("last_run_files", "gauge", "Files handled by the last run, by outcome",
+               [(f'outcome="{outcome}"', files[outcome]) for outcome in ("seen", "moved", "skipped", "failed")])
+        metric("last_run_collisions", "gauge", "Files the last run had to give a free name", [("", files["collisions"])])
+        metric("last_run_skipped_files", "gauge", "Files skipped by the last run, by reason",
+               [(f'reason="{_escape_label(reason)}"', count) for reason, count in sorted(data["skipped_by_reason"].items())])
+        metric("last_run_bytes_copied", "gauge", "Bytes copied by the last run", [("", data["bytes"]["copied"])])
+        metric("last_run_duration_seconds", "gauge", "Duration of the last run", [("", data["elapsed_seconds"])])
+        metric("last_run_files_per_second", "gauge", "Files moved per second in the last run",
+               [("", data["throughput"]["files_per_sec"])])
+        metric("last_run_success", "gauge", "1 if the last run finished without failures",
+               [("", int(data["status"] == STATUS_DONE and not files["failed"]))])
+        metric("last_run_timestamp_seconds", "gauge", "When the last run finished",
+               [("", int(datetime.fromisoformat(data["finished"]).timestamp()))])
+
+        _write_atomic(Path(path), "\n".join(lines) + "\n")
+
+def _latest_matching(reports_dir: Path, source: str, dry_run: bool):
+    for path in sorted(reports_dir.glob("report_*.json"), reverse=True):
+        try:
+            with open(path, encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if report.get("source") == source and report.get("dry_run") == dry_run:
+            return report
+    return None
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _write_atomic(path: Path, text: str):
+    # Readers such as node_exporter never see a half-written file
+    temporary = path.with_name(f".{path.name}.tmp")
+    temporary.write_text(text, encoding="utf-8")
+    os.replace(temporary, path)
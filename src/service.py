@@ -0,0 +1,448 @@
+# service.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import itertools
+import json
+import os
+import queue
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from gi.repository import Gio, GLib
+from . import store
+from .autotune import DEFAULT_METADATA_WORKERS, DEFAULT_TRANSFER_WORKERS, TuningStore
+from .library_index import LibraryIndex
+from .metrics import RunMetrics
+from .profiling import RunProfiler
+from .run_log import RunLog
+from .traversal import DEFAULT_WALK_WORKERS
+from .throttle import IOPRIO_CLASSES, IoLimiter, set_io_priority, set_niceness
+from .utils import MetadataCache, handle_files, open_dir_index
+
+BUS_NAME = 'com.thecirculark.photoorganizer'
+OBJECT_PATH = '/com/thecirculark/photoorganizer'
+INTERFACE_NAME = 'com.thecirculark.photoorganizer.Organizer'
+
+INTERFACE_XML = f"""
+<node>
+  <interface name="{INTERFACE_NAME}">
+    <method name="Organize">
+      <arg type="a{{sv}}" name="options" direction="in"/>
+      <arg type="i" name="priority" direction="in"/>
+      <arg type="u" name="job_id" direction="out"/>
+    </method>
+    <method name="DryRun">
+      <arg type="a{{sv}}" name="options" direction="in"/>
+      <arg type="i" name="priority" direction="in"/>
+      <arg type="u" name="job_id" direction="out"/>
+    </method>
+    <method name="Cancel">
+      <arg type="u" name="job_id" direction="in"/>
+      <arg type="b" name="found" direction="out"/>
+    </method>
+    <method name="ListJobs">
+      <arg type="a(uss)" name="jobs" direction="out"/>
+    </method>
+    <method name="SetLimits">
+      <arg type="a{{sv}}" name="limits" direction="in"/>
+    </method>
+    <method name="GetMetrics">
+      <arg type="u" name="job_id" direction="in"/>
+      <arg type="s" name="metrics_json" direction="out"/>
+    </method>
+    <signal name="JobLog">
+      <arg type="u" name="job_id"/>
+      <arg type="s" name="message"/>
+    </signal>
+    <signal name="JobFinished">
+      <arg type="u" name="job_id"/>
+      <arg type="s" name="state"/>
+    </signal>
+  </interface>
+</node>
+"""
+
+# Keep the service (and its caches) around this long after the last job
+SERVICE_IDLE_TIMEOUT_MS = 10 * 60 * 1000
+
+# Directory and library indexes kept open between jobs, each; the least
+# recently used one is closed to make room
+OPEN_INDEX_LIMIT = 8
+
+LIMIT_KEYS = ("bytes_per_sec", "files_per_sec", "io_class", "io_level", "nice")
+WORKER_KEYS = ("metadata_workers", "transfer_workers")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+
+class Job:
+    """
+    One organize or dry-run request.
+
+    options mirrors the D-Bus a{sv}: source, destination (organizes when
+    present), rename, full, walk_workers, ordered, metadata_workers and
+    transfer_workers as (min, max) bounds, profile (a profiling mode),
+    report_textfile and library_index. bytes_per_sec, files_per_sec,
+    io_class, io_level and nice set I/O limits for this job alone.
+    Jobs submitted in-process may also pass logger/planner/on_finished
+    callbacks. D-Bus jobs carry client, the (connection, sender, object
+    path) that submitted them, and their log lines are sent to that sender
+    alone. Profiles are written next to artifact_path, normally the job's
+    run log.
+    """
+
+    def __init__(self, job_id: int, options: dict, dry_run: bool, priority: int = 0,
+                 logger=None, planner=None, on_finished=None, artifact_path=None, client=None):
+        self.id = job_id
+        self.options = options
+        self.dry_run = dry_run
+        self.priority = priority
+        self.logger = logger
+        self.planner = planner
+        self.on_finished = on_finished
+        self.artifact_path = artifact_path
+        self.client = client
+        self.state = JOB_QUEUED
+        self.cancel_event = threading.Event()
+        self.metrics = RunMetrics()
+
+def _keep_open(cache: OrderedDict, key, index):
+    """Add an index to an LRU of open ones, closing the oldest past OPEN_INDEX_LIMIT"""
+    cache[key] = index
+    while len(cache) > OPEN_INDEX_LIMIT:
+        _, evicted = cache.popitem(last=False)
+        evicted.close()
+
+class JobQueue:
+    """
+    Runs jobs one at a time on a worker thread, highest priority first.
+
+    The metadata cache, open directory indexes and destination library
+    indexes outlive individual jobs so repeated runs over the same tree
+    start warm; the last OPEN_INDEX_LIMIT indexes of each kind are kept. Jobs share one IoLimiter, whose limits can be changed while
+    a job runs, unless they bring limits of their own. Concurrency
+    bounds and the report textfile not given in a job's options come from
+    worker_bounds and report_textfile.
+    """
+
+    def __init__(self, on_log=None, on_finished=None, on_busy_changed=None):
+        self._queue = queue.PriorityQueue()
+        self._ids = itertools.count(1)
+        self._order = itertools.count()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._on_log = on_log
+        self._on_finished = on_finished
+        self._on_busy_changed = on_busy_changed
+
+        self.metadata_cache = MetadataCache()
+        self.limiter = IoLimiter()
+        self.tuning = TuningStore()
+        self.worker_bounds = {
+            "metadata_workers": DEFAULT_METADATA_WORKERS,
+            "transfer_workers": DEFAULT_TRANSFER_WORKERS,
+        }
+        self.report_textfile = None
+        self._dir_indexes = OrderedDict()
+        self._libraries = OrderedDict()
+        self._io_priority = (None, 4, None)
+        self._running_job = None
+        self._pool_threads = set()
+        self._pool_threads_lock = threading.Lock()
+
+        self._worker = threading.Thread(target=self._run, name="organizer-jobs", daemon=True)
+        self._worker.start()
+
+    def submit(self, options: dict, dry_run: bool, priority: int = 0, **callbacks) -> Job:
+        job = Job(next(self._ids), options, dry_run, priority, **callbacks)
+        with self._lock:
+            self._jobs[job.id] = job
+            if self._on_busy_changed and len(self._jobs) == 1:
+                self._on_busy_changed(True)
+        self._queue.put((-priority, next(self._order), job))
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def jobs(self):
+        with self._lock:
+            return [(job.id, job.state, job.options.get("source", "")) for job in self._jobs.values()]
+
+    def get_job(self, job_id: int):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def set_io_priority(self, io_class: str = None, level: int = 4, niceness: int = None):
+        """Apply ionice class/level and niceness to the worker threads, even mid-job"""
+        self._io_priority = (io_class, level, niceness)
+        with self._pool_threads_lock:
+            pool_threads = list(self._pool_threads)
+            job = self._running_job
+        _apply_io_priority(self._worker.native_id, self._io_priority)
+        for thread_id in pool_threads:
+            _apply_io_priority(thread_id, self._job_io_priority(job))
+
+    def _job_io_priority(self, job: Job):
+        """The shared priority, with the ionice class and niceness the job asked for"""
+        io_class, level, niceness = self._io_priority
+        if job is not None:
+            if "io_class" in job.options:
+                io_class, level = job.options["io_class"], job.options.get("io_level", 4)
+            niceness = job.options.get("nice", niceness)
+        return io_class, level, niceness
+
+    def _on_pool_thread_started(self):
+        # Runs in each metadata/transfer thread as the job starts it. A
+        # job's own priority only goes to these threads, which end with it.
+        thread_id = threading.get_native_id()
+        with self._pool_threads_lock:
+            self._pool_threads.add(thread_id)
+            job = self._running_job
+        _apply_io_priority(thread_id, self._job_io_priority(job))
+
+    def _dir_index_for(self, source, rename, organize, destination, full):
+        # The index object is cheap to keep open; its signature covers the options
+        index = open_dir_index(source, rename, organize, destination, full=full)
+        if full:
+            return index, True
+        cached = self._dir_indexes.get(index.signature)
+        if cached is not None:
+            index.close()
+            self._dir_indexes.move_to_end(index.signature)
+            return cached, False
+        _keep_open(self._dir_indexes, index.signature, index)
+        return index, False
+
+    def _library_for(self, destination: Path, full: bool):
+        # Loaded once per destination, then only checked for drift
+        key = str(destination.resolve())
+        library = self._libraries.get(key)
+        if library is None:
+            library = LibraryIndex(destination)
+            _keep_open(self._libraries, key, library)
+        else:
+            self._libraries.move_to_end(key)
+        return library, library.prepare(full=full)
+
+    def _run(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job.cancel_event.is_set():
+                job.state = JOB_CANCELLED
+            else:
+                job.state = JOB_RUNNING
+                try:
+                    self._run_job(job)
+                    job.state = JOB_CANCELLED if job.cancel_event.is_set() else JOB_DONE
+                except Exception as e:
+                    self._log(job, f"Job failed: {e}")
+                    job.state = JOB_FAILED
+
+            job.metrics.finish()
+            if job.on_finished:
+                job.on_finished(job)
+            if self._on_finished:
+                self._on_finished(job)
+
+            with self._lock:
+                del self._jobs[job.id]
+                if self._on_busy_changed and not self._jobs:
+                    self._on_busy_changed(False)
+
+    def _log(self, job: Job, message: str):
+        if job.logger:
+            job.logger(message)
+        if self._on_log:
+            self._on_log(job, message)
+
+    def _run_job(self, job: Job):
+        source = Path(job.options["source"])
+        destination = job.options.get("destination")
+        organize = bool(destination)
+        destination = Path(destination).resolve() if organize else source
+        rename = job.options.get("rename", False)
+
+        profiler = None
+        if job.options.get("profile"):
+            artifact_path = job.artifact_path or store.get_state_dir() / "logs" / f"job_{job.id}_{os.getpid()}.log"
+            artifact_path.parent.mkdir(parents=True, exist_ok=True)
+            profiler = RunProfiler(job.options["profile"], artifact_path)
+
+        library = None
+        if organize and job.options.get("library_index"):
+            library, scanned = self._library_for(destination, job.options.get("full", False))
+            self._log(job, f"Library index: scanned {scanned} folders")
+
+        limiter = self.limiter
+        if "bytes_per_sec" in job.options or "files_per_sec" in job.options:
+            # Limits of the job's own, so they don't outlast it
+            limiter = IoLimiter(job.options.get("bytes_per_sec", self.limiter.bytes_per_sec),
+                                job.options.get("files_per_sec", self.limiter.files_per_sec))
+
+        dir_index, owned = self._dir_index_for(source, rename, organize, destination, job.options.get("full", False))
+        with self._pool_threads_lock:
+            self._running_job = job
+        try:
+            handle_files(
+                source_folder=source,
+                rename_enabled=rename,
+                organize_enabled=organize,
+                organize_dir=destination,
+                dry_run=job.dry_run,
+                logger=lambda message: self._log(job, message),
+                dir_index=dir_index,
+                planner=job.planner,
+                metadata_cache=self.metadata_cache,
+                cancel_event=job.cancel_event,
+                limiter=limiter,
+                metrics=job.metrics,
+                walk_workers=job.options.get("walk_workers", DEFAULT_WALK_WORKERS),
+                ordered_walk=job.options.get("ordered"),
+                metadata_workers=tuple(job.options.get("metadata_workers", self.worker_bounds["metadata_workers"])),
+                transfer_workers=tuple(job.options.get("transfer_workers", self.worker_bounds["transfer_workers"])),
+                tuning=self.tuning,
+                worker_init=self._on_pool_thread_started,
+                profiler=profiler,
+                report_textfile=job.options.get("report_textfile") or self.report_textfile,
+                library=library
+            )
+        finally:
+            # The job's pools are gone once handle_files returns
+            with self._pool_threads_lock:
+                self._pool_threads.clear()
+                self._running_job = None
+            if owned:
+                dir_index.close()
+
+def _apply_io_priority(thread_id: int, priority):
+    io_class, level, niceness = priority
+    if io_class is not None and io_class in IOPRIO_CLASSES:
+        set_io_priority(IOPRIO_CLASSES[io_class], level, thread_id)
+    if niceness is not None:
+        set_niceness(niceness, thread_id)
+
+class OrganizerService:
+    """Exports a JobQueue on D-Bus next to the GApplication's own interfaces"""
+
+    def __init__(self, application):
+        self.application = application
+        self.jobs = JobQueue(
+            on_log=self._on_job_log,
+            on_finished=self._on_job_finished,
+            on_busy_changed=self._on_busy_changed
+        )
+        self._node_info = Gio.DBusNodeInfo.new_for_xml(INTERFACE_XML)
+        self._registrations = []
+
+    def register(self, connection: Gio.DBusConnection, object_path: str):
+        registration_id = connection.register_object(
+            object_path,
+            self._node_info.interfaces[0],
+            self._on_method_call,
+            None,
+            None
+        )
+        self._registrations.append((connection, registration_id, object_path))
+
+    def unregister(self, connection: Gio.DBusConnection):
+        for registered in list(self._registrations):
+            if registered[0] == connection:
+                connection.unregister_object(registered[1])
+                self._registrations.remove(registered)
+
+    def _on_method_call(self, connection, sender, object_path, interface_name, method_name, parameters, invocation):
+        if method_name in ("Organize", "DryRun"):
+            options, priority = parameters.unpack()
+            if not options.get("source"):
+                invocation.return_dbus_error(f"{INTERFACE_NAME}.Error.InvalidArgs", "Missing 'source' option")
+                return
+            dry_run = method_name == "DryRun"
+            run_log = RunLog.from_settings()
+
+            def on_finished(job):
+                for line in job.metrics.summary_lines():
+                    run_log.write(line)
+                run_log.close()
+
+            job = self.jobs.submit(options, dry_run, priority, logger=run_log.write, on_finished=on_finished,
+                                   artifact_path=run_log.path, client=(connection, sender, object_path))
+            invocation.return_value(GLib.Variant("(u)", (job.id,)))
+        elif method_name == "Cancel":
+            (job_id,) = parameters.unpack()
+            invocation.return_value(GLib.Variant("(b)", (self.jobs.cancel(job_id),)))
+        elif method_name == "ListJobs":
+            invocation.return_value(GLib.Variant("(a(uss))", (self.jobs.jobs(),)))
+        elif method_name == "SetLimits":
+            (limits,) = parameters.unpack()
+            self.set_limits(**{key: value for key, value in limits.items() if key in LIMIT_KEYS})
+            invocation.return_value(None)
+        elif method_name == "GetMetrics":
+            (job_id,) = parameters.unpack()
+            job = self.jobs.get_job(job_id)
+            if job is None:
+                invocation.return_dbus_error(f"{INTERFACE_NAME}.Error.NoSuchJob", f"No such job: {job_id}")
+                return
+            invocation.return_value(GLib.Variant("(s)", (json.dumps(job.metrics.snapshot()),)))
+        else:
+            invocation.return_dbus_error("org.freedesktop.DBus.Error.UnknownMethod", method_name)
+
+    def set_limits(self, bytes_per_sec=None, files_per_sec=None, io_class=None, io_level=4, nice=None):
+        """Change the shared I/O limits; takes effect on the running job immediately"""
+        self.jobs.limiter.set_limits(bytes_per_sec, files_per_sec)
+        self.jobs.set_io_priority(io_class, io_level, nice)
+
+    def apply_settings(self, settings):
+        """Load the limits (KiB/s and files/s, 0 meaning unlimited), worker bounds and report textfile from GSettings"""
+        self.set_limits(
+            bytes_per_sec=settings.get_int('io-max-kib-per-sec') * 1024,
+            files_per_sec=settings.get_int('io-max-files-per-sec'),
+            io_class=settings.get_string('io-priority-class'),
+            nice=settings.get_int('io-nice')
+        )
+        for key in WORKER_KEYS:
+            self.jobs.worker_bounds[key] = tuple(settings.get_value('io-' + key.replace('_', '-')).unpack())
+        self.jobs.report_textfile = settings.get_string('report-textfile') or None
+
+    def _emit(self, signal_name: str, parameters: GLib.Variant):
+        for connection, _, object_path in self._registrations:
+            connection.emit_signal(None, object_path, INTERFACE_NAME, signal_name, parameters)
+
+    def _on_job_log(self, job: Job, message: str):
+        # A large run logs a line per file: only the client that asked gets them
+        if job.client is None:
+            return
+        connection, sender, object_path = job.client
+        connection.emit_signal(sender, object_path, INTERFACE_NAME, "JobLog",
+                               GLib.Variant("(us)", (job.id, str(message))))
+
+    def _on_job_finished(self, job: Job):
+        self._emit("JobFinished", GLib.Variant("(us)", (job.id, job.state)))
+
+    def _on_busy_changed(self, busy: bool):
+        # Keep the application alive while jobs are queued or running
+        GLib.idle_add(self.application.hold if busy else self.application.release)
@@ -0,0 +1,52 @@
+# store.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import sqlite3
+from pathlib import Path
+from gi.repository import GLib
+
+APP_DIR_NAME = "photoorganizer"
+STORE_FILENAME = "store.db"
+
+def get_cache_dir() -> Path:
+    """Directory holding the on-disk metadata store (XDG cache dir)"""
+    path = Path(GLib.get_user_cache_dir()) / APP_DIR_NAME
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def get_state_dir() -> Path:
+    """Directory holding run logs and other per-run artifacts (XDG state dir)"""
+    path = Path(GLib.get_user_state_dir()) / APP_DIR_NAME
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def connect(path: Path = None) -> sqlite3.Connection:
+    """
+    Open the metadata store.
+
+    The connection may be shared between the GUI thread and the worker
+    thread, so callers are expected to serialize access themselves.
+    """
+    if path is None:
+        path = get_cache_dir() / STORE_FILENAME
+
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
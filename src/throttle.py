@@ -0,0 +1,150 @@
+# throttle.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import ctypes
+import ctypes.util
+import os
+import platform
+import threading
+import time
+
+# I/O scheduling classes, as used by ionice(1)
+IOPRIO_CLASS_NONE = 0
+IOPRIO_CLASS_REALTIME = 1
+IOPRIO_CLASS_BEST_EFFORT = 2
+IOPRIO_CLASS_IDLE = 3
+
+IOPRIO_CLASSES = {
+    "none": IOPRIO_CLASS_NONE,
+    "best-effort": IOPRIO_CLASS_BEST_EFFORT,
+    "idle": IOPRIO_CLASS_IDLE,
+}
+
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+_SYS_IOPRIO_SET = {"x86_64": 251, "i686": 289, "aarch64": 30, "armv7l": 314, "ppc64le": 273, "riscv64": 30}
+
+class TokenBucket:
+    """
+    Token bucket that lets a caller go into debt.
+
+    A request larger than the bucket still goes through, and the caller then
+    sleeps off the debt, so one large file can't stall forever. A rate of 0
+    means unlimited.
+    """
+
+    def __init__(self, rate: float = 0, burst: float = None):
+        self._lock = threading.Lock()
+        self._updated = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: float, burst: float = None):
+        with self._lock:
+            self.rate = max(0.0, float(rate))
+            # One second worth of tokens unless told otherwise
+            self.burst = float(burst) if burst is not None else self.rate
+            self._tokens = self.burst
+
+    def consume(self, amount: float) -> float:
+        """Take `amount` tokens, sleeping if needed. Returns the seconds slept."""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+class IoLimiter:
+    """
+    Shared limits for every transfer and metadata read of the engine.
+
+    Limits can be changed at any time from any thread; running jobs pick up
+    the new rates on their next read or write.
+    """
+
+    def __init__(self, bytes_per_sec: float = 0, files_per_sec: float = 0):
+        self._bytes = TokenBucket()
+        self._files = TokenBucket()
+        self.set_limits(bytes_per_sec, files_per_sec)
+
+    def set_limits(self, bytes_per_sec: float = None, files_per_sec: float = None):
+        if bytes_per_sec is not None:
+            self._bytes.set_rate(bytes_per_sec)
+        if files_per_sec is not None:
+            self._files.set_rate(files_per_sec)
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self._bytes.rate
+
+    @property
+    def files_per_sec(self) -> float:
+        return self._files.rate
+
+    def acquire_file(self, metrics=None):
+        self._account(self._files.consume(1), metrics)
+
+    def acquire_bytes(self, amount: int, metrics=None):
+        self._account(self._bytes.consume(amount), metrics)
+
+    def publish(self, metrics):
+        """Show the current limits in the run metrics"""
+        metrics.set("limit_bytes_per_sec", self.bytes_per_sec)
+        metrics.set("limit_files_per_sec", self.files_per_sec)
+
+    def _account(self, waited: float, metrics):
+        if metrics is not None:
+            self.publish(metrics)
+            if waited:
+                metrics.add("throttle_wait_seconds", waited)
+
+def set_io_priority(io_class: int, level: int = 4, thread_id: int = None) -> bool:
+    """
+    Set the I/O scheduling class of a thread (the calling one by default),
+    like `ionice -c CLASS -n LEVEL`. Returns False where unsupported.
+    """
+    syscall_number = _SYS_IOPRIO_SET.get(platform.machine())
+    libc_name = ctypes.util.find_library("c")
+    if syscall_number is None or libc_name is None:
+        return False
+
+    if thread_id is None:
+        thread_id = threading.get_native_id()
+    libc = ctypes.CDLL(libc_name, use_errno=True)
+    # Only the realtime and best-effort classes take a level; the kernel
+    # rejects one for the others
+    has_level = io_class in (IOPRIO_CLASS_REALTIME, IOPRIO_CLASS_BEST_EFFORT)
+    value = (io_class << _IOPRIO_CLASS_SHIFT) | (level & 0x7 if has_level else 0)
+    return libc.syscall(syscall_number, _IOPRIO_WHO_PROCESS, thread_id, value) == 0
+
+def set_niceness(niceness: int, thread_id: int = None) -> bool:
+    """Set the niceness of a thread (the calling one by default). On Linux this only affects that thread."""
+    if thread_id is None:
+        thread_id = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, thread_id, niceness)
+    except (OSError, AttributeError):
+        return False
+    return True
@@ -0,0 +1,199 @@
+# traversal.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import queue
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .dir_index import entries_digest
+from .profiling import count_syscall
+
+DEFAULT_WALK_WORKERS = 8
+
+# Directory listings the walk may hold ahead of its caller, per worker
+LOOKAHEAD_PER_WORKER = 4
+
+def list_directory(path: str):
+    """Split a directory listing into file names and subdirectory names, like os.walk"""
+    files = []
+    dirs = []
+    count_syscall("scandir")
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                files.append(entry.name)
+            elif not entry.is_symlink():
+                dirs.append(entry.name)
+    return files, dirs
+
+def visit_directory(root: str, dir_index=None):
+    """
+    Look at one directory. Returns (files, dirs, process), or None when it
+    can't be read.
+
+    Directories whose mtime matches the index are not listed at all; their
+    recorded subdirectories are returned with process=False. A directory's
+    mtime does not change when something deeper in the tree does, so each
+    directory still costs one stat, but no per-file work.
+    """
+    try:
+        count_syscall("stat")
+        mtime_ns = os.stat(root).st_mtime_ns
+    except OSError:
+        return None
+
+    record = dir_index.lookup(root) if dir_index else None
+    if record and record.mtime_ns == mtime_ns:
+        return [], list(record.subdirs), False
+
+    try:
+        files, dirs = list_directory(root)
+    except OSError:
+        return None
+
+    if record and record.digest == entries_digest(files + dirs):
+        # Touched but same entries - refresh the mtime and move on
+        dir_index.record(root, mtime_ns, record.digest, dirs)
+        return files, dirs, False
+
+    return files, dirs, True
+
+class _ListingStats:
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.started = time.monotonic()
+        self.count = 0
+
+    def listed(self):
+        if self.metrics is None:
+            return
+        self.count += 1
+        self.metrics.add("dirs_listed")
+        elapsed = time.monotonic() - self.started
+        if elapsed > 0:
+            self.metrics.set("dirs_per_sec", self.count / elapsed)
+
+def walk_source(source_folder: Path, dir_index=None, workers: int = 1, ordered: bool = False, metrics=None,
+                initializer=None):
+    """
+    Yields (root, files, dirs) for every directory that needs processing.
+
+    With more than one worker, directories are listed concurrently on a
+    thread pool and handed out as soon as they are listed, so the caller
+    can start on the first directory while the rest of the tree is still
+    being read. Pass ordered=True to get them in a fixed pre-order (sorted
+    subdirectories) regardless of how the listings finish. At most
+    LOOKAHEAD_PER_WORKER listings per worker are read ahead of the caller.
+    initializer is called in every new pool thread.
+    """
+    stats = _ListingStats(metrics)
+    root = str(source_folder)
+
+    if workers <= 1:
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            visited = visit_directory(path, dir_index)
+            stats.listed()
+            if visited is None:
+                continue
+            files, dirs, process = visited
+            if process:
+                yield path, files, dirs
+            children = sorted(dirs) if ordered else dirs
+            stack.extend(os.path.join(path, d) for d in reversed(children))
+        return
+
+    # In flight or parked: enough to keep the pool busy, without buffering
+    # a whole tree for a slow caller
+    limit = workers * LOOKAHEAD_PER_WORKER
+    results = queue.Queue()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="walk", initializer=initializer)
+    pending = 0
+
+    def visit(path):
+        try:
+            results.put((path, visit_directory(path, dir_index)))
+        except BaseException:
+            results.put((path, None))
+
+    def submit(path):
+        nonlocal pending
+        pending += 1
+        pool.submit(visit, path)
+
+    def receive():
+        nonlocal pending
+        path, visited = results.get()
+        pending -= 1
+        stats.listed()
+        return path, visited
+
+    try:
+        if not ordered:
+            waiting = deque([root])
+            while waiting or pending:
+                while waiting and pending < limit:
+                    submit(waiting.popleft())
+                path, visited = receive()
+                if visited is None:
+                    continue
+                waiting.extend(os.path.join(path, d) for d in visited[1])
+                if visited[2]:
+                    yield path, visited[0], visited[1]
+            return
+
+        # Directories come off the stack in walk order; the ones nearest its
+        # top are listed ahead while the limit allows
+        finished = {}
+        requested = set()
+        stack = [root]
+        while stack:
+            for path in reversed(stack[-2 * limit:]):
+                if pending + len(finished) >= limit:
+                    break
+                if path not in requested:
+                    requested.add(path)
+                    submit(path)
+            wanted = stack.pop()
+            if wanted not in requested:
+                # The limit is taken by listings parked further down
+                requested.add(wanted)
+                submit(wanted)
+            while wanted not in finished:
+                path, visited = receive()
+                finished[path] = visited
+            requested.discard(wanted)
+            visited = finished.pop(wanted)
+            if visited is None:
+                continue
+            files, dirs, process = visited
+            if process:
+                yield wanted, files, dirs
+            stack.extend(os.path.join(wanted, d) for d in reversed(sorted(dirs)))
+    finally:
+        # Running listings are single directories; let them finish so none
+        # of them touches the index after the caller has closed it
+        pool.shutdown(wait=True, cancel_futures=True)
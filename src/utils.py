@@ -1,10 +1,73 @@
 import argparse
+import errno
 import os
+import re
 import shutil
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from exif import Image
 from datetime import datetime
 from gi.repository import Gio
+from .archives import open_archive
+from .exif_tiff import SUPPORTED_FIELDS as TIFF_FIELDS, read_tiff_metadata
+from .library_index import name_family
+from .autotune import DEFAULT_METADATA_WORKERS, DEFAULT_TRANSFER_WORKERS, ConcurrencyController, device_key, run_adaptive
+from .metrics import RunMetrics
+from .run_report import STATUS_CANCELLED, STATUS_DONE, STATUS_FAILED, RunReport
+from .dir_index import DirectoryIndex, entries_digest, make_signature
+from .traversal import DEFAULT_WALK_WORKERS, list_directory, walk_source
+from .profiling import count_syscall
+from .naming_patterns import SEQ_TOKEN, UNKNOWN_VALUE, compile_pattern
+
+# A photo whose capture time is known, waiting to be planned
+PhotoInfo = namedtuple("PhotoInfo", ["path", "dt", "ms", "metadata"])
+
+# One decision made for a source file: action is "move", "skip" or "error",
+# collision is True when the target had to be renamed to a free name
+PlanEntry = namedtuple("PlanEntry", ["source", "target", "action", "reason", "collision"])
+
+class LogLine(str):
+    """A log line that also carries the PlanEntry it describes, for loggers that keep structured records"""
+
+    def __new__(cls, message: str, entry: PlanEntry):
+        line = super().__new__(cls, message)
+        line.entry = entry
+        return line
+
+def _log_outcome(logger, planner, message: str, entry: PlanEntry):
+    """Report one file's outcome: a line to logger, the entry to planner"""
+    logger(LogLine(message, entry))
+    if planner:
+        planner(entry)
+
+# The engine's file system calls go through these, so a profiled run can
+# count them without hooking the whole process
+def _stat(path):
+    count_syscall("stat")
+    return os.stat(path)
+
+def _open(path, mode="rb"):
+    count_syscall("open")
+    return open(path, mode)
+
+def _rename(source, target):
+    count_syscall("rename")
+    os.rename(source, target)
+
+def _unlink(path, missing_ok=False):
+    count_syscall("unlink")
+    Path(path).unlink(missing_ok=missing_ok)
+
+def _mkdir(path):
+    count_syscall("mkdir")
+    Path(path).mkdir(parents=True, exist_ok=True)
+
+def _exists(path) -> bool:
+    count_syscall("stat")
+    return os.path.exists(path)
 
 def parse_datetime_with_milliseconds(img: Image):
     """
@@ -38,18 +101,159 @@ def parse_datetime_with_milliseconds(img: Image):
     dt = datetime.strptime(dt_str, "%Y:%m:%d %H:%M:%S")
     return dt, ms_str
 
-def get_image_datetime_taken(image_path: Path):
+# Enough for the EXIF APP1 segment of a JPEG, which is capped at 64 KiB
+HEADER_READ_BYTES = 128 * 1024
+
+# Camera file names: a letter prefix, then the counter (DSC_0042, _DSC0042,
+# DSCF0042, P1010042), maybe followed by a suffix such as " (1)" or "-edit"
+# Camera counters run to 4 digits, 7 with a folder number in front
+# (Panasonic's P1010001); 8 or more is a date, as in IMG_20250115_143025
+_CAMERA_NAME = re.compile(r"_?[A-Za-z]+_?(\d{1,7})(?:\D.*)?")
+
+def file_counter(path: Path):
+    """
+    The camera's file counter in a source name (DSC_0042.JPG -> "0042"), or
+    None for names that don't look like a camera's, such as ones this app
+    gave them or a phone's date-stamped ones
+    """
+    counter = _CAMERA_NAME.fullmatch(path.stem)
+    return counter.group(1) if counter else None
+
+def _read_chunk(stream, size, limiter, metrics):
+    data = stream.read(size) if size else stream.read()
+    if limiter:
+        limiter.acquire_bytes(len(data), metrics)
+    if metrics:
+        metrics.add("metadata_bytes_read", len(data))
+    return data
+
+def _parse_metadata(data: bytes, fields, image_path: Path):
+    img = Image(data)
+    if not img.has_exif:
+        return None, None, {}
+
+    dt, ms = parse_datetime_with_milliseconds(img)
+    if not dt:
+        return None, None, {}
+
+    # exif decodes a tag's value only when it is asked for, so untouched
+    # fields cost nothing
+    metadata = {}
+    for field in fields:
+        if field == "counter":
+            metadata[field] = file_counter(image_path)
+        else:
+            metadata[field] = img.get(field)
+    return dt, ms, metadata
+
+def read_stream_metadata(stream, image_path: Path, fields=frozenset(), limiter=None, metrics=None):
+    """
+    Like get_image_metadata, for a file object positioned at the start of
+    the image. Returns (datetime, milliseconds, metadata, data), where data
+    is every byte taken from the stream: normally just the head, all of it
+    when the EXIF data runs past the head.
+    """
+    data = _read_chunk(stream, HEADER_READ_BYTES, limiter, metrics)
     try:
-        with open(image_path, "rb") as f:
-            img = Image(f)
-            if not img.has_exif:
-                return None, None
-            return parse_datetime_with_milliseconds(img)
+        return (*_parse_metadata(data, fields, image_path), data)
     except Exception:
-        return None, None
+        if len(data) < HEADER_READ_BYTES:
+            return None, None, {}, data
+    if metrics:
+        metrics.add("metadata_full_reads")
+    data += _read_chunk(stream, None, limiter, metrics)
+    try:
+        return (*_parse_metadata(data, fields, image_path), data)
+    except Exception:
+        return None, None, {}, data
+
+def get_image_metadata(image_path: Path, fields=frozenset(), limiter=None, metrics=None):
+    """
+    Returns (datetime, milliseconds, metadata) where metadata holds only the
+    requested fields (EXIF attribute names, plus "counter").
+
+    The file's TIFF structures are walked with positioned reads, so only
+    the blocks holding them are read, even when they sit deep into a RAW
+    file. Files that parser can't handle, and fields it doesn't know, go
+    through get_exif_metadata.
+    """
+    if fields <= TIFF_FIELDS:
+        try:
+            dt, ms, metadata, touched = read_tiff_metadata(image_path, fields)
+        except Exception:
+            if metrics:
+                metrics.add("metadata_tiff_fallbacks")
+        else:
+            if limiter:
+                limiter.acquire_bytes(touched, metrics)
+            if metrics:
+                metrics.add("metadata_bytes_read", touched)
+            if dt and "counter" in fields:
+                metadata["counter"] = file_counter(image_path)
+            return dt, ms, metadata
+    return get_exif_metadata(image_path, fields, limiter, metrics)
+
+def get_exif_metadata(image_path: Path, fields=frozenset(), limiter=None, metrics=None):
+    """
+    get_image_metadata using the exif package. Only the head of the file is
+    read. If the EXIF data runs past it, the rest of the file is read and
+    parsed again.
+    """
+    try:
+        with _open(image_path) as f:
+            dt, ms, metadata, _ = read_stream_metadata(f, image_path, fields, limiter, metrics)
+        return dt, ms, metadata
+    except Exception:
+        return None, None, {}
+
+def get_image_datetime_taken(image_path: Path, limiter=None, metrics=None):
+    dt, ms, _ = get_image_metadata(image_path, frozenset(), limiter, metrics)
+    return dt, ms
 
-def build_filename(dt: datetime, milliseconds: str, ext: str, pattern: str = None):
-    """Build filename using custom pattern or default"""
+class MetadataCache:
+    """
+    LRU cache of EXIF metadata keyed by path, size and mtime.
+
+    Kept alive between jobs by the background service, so a dry run followed
+    by the real run only parses each file once. A job asking for fields
+    that weren't extracted before re-reads the file and widens the entry.
+    """
+
+    def __init__(self, capacity: int = 200_000):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_metadata(self, image_path: Path, fields=frozenset(), limiter=None, metrics=None):
+        try:
+            st = _stat(image_path)
+        except OSError:
+            return None, None, {}
+        key = (str(image_path), st.st_size, st.st_mtime_ns)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                cached_fields, result = cached
+                if fields <= cached_fields:
+                    return result
+                fields = fields | cached_fields
+
+        result = get_image_metadata(image_path, fields, limiter, metrics)
+        with self._lock:
+            self._entries[key] = (frozenset(fields), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return result
+
+    def get_datetime_taken(self, image_path: Path, limiter=None, metrics=None):
+        dt, ms, _ = self.get_metadata(image_path, frozenset(), limiter, metrics)
+        return dt, ms
+
+def build_filename(dt: datetime, milliseconds: str, ext: str, pattern: str = None, metadata=None):
+    """Build filename using custom pattern or default. SEQ is left for plan_targets to number."""
     if pattern is None:
         # Try to get pattern from settings, fall back to default
         try:
@@ -58,31 +262,9 @@ def build_filename(dt: datetime, milliseconds: str, ext: str, pattern: str = Non
         except:
             pattern = "YYYYMMDD-HHmmss-MS"
 
-    # Apply pattern - order matters! Replace longer tokens first
-    replacements = {
-        'YYYY': f"{dt.year:04d}",
-        'MM': f"{dt.month:02d}",
-        'DD': f"{dt.day:02d}",
-        'HH': f"{dt.hour:02d}",
-        'mm': f"{dt.minute:02d}",
-        'ss': f"{dt.second:02d}",
-        'MS': milliseconds,
-        'YY': f"{dt.year:02d}",
-        'ext': ext,
-    }
-
-    result = pattern
-    # Sort tokens by length (longest first) to prevent partial replacements
-    for token in sorted(replacements.keys(), key=len, reverse=True):
-        result = result.replace(token, replacements[token])
-
-    # If pattern doesn't include ext token, append the extension
-    if 'ext' not in pattern and ext:
-        result += ext
-
-    return result
-
-def build_folder_path(dt: datetime, pattern: str = None) -> str:
+    return compile_pattern(pattern, True).render(dt, milliseconds, ext, metadata)
+
+def build_folder_path(dt: datetime, pattern: str = None, metadata=None) -> str:
     """Build folder path using custom pattern or default"""
     if pattern is None:
         # Try to get pattern from settings, fall back to default
@@ -92,25 +274,90 @@ def build_folder_path(dt: datetime, pattern: str = None) -> str:
         except:
             pattern = "YYYY/MM-Month"
 
-    # Apply pattern - order matters! Replace longer tokens first
-    replacements = {
-        'Month': dt.strftime('%B'),
-        'YYYY': f"{dt.year:04d}",
-        'MM': f"{dt.month:02d}",
-        'DD': f"{dt.day:02d}",
-        'Mon': dt.strftime('%b'),
-        'YY': f"{dt.year:02d}",
-    }
-
-    result = pattern
-    # Sort tokens by length (longest first) to prevent partial replacements
-    for token in sorted(replacements.keys(), key=len, reverse=True):
-        result = result.replace(token, replacements[token])
-
-    return result
-
-def resolve_collision(target_path: Path) -> Path:
-    if not target_path.exists():
+    return compile_pattern(pattern, False).render(dt, metadata=metadata)
+
+def sequence_sort_key(photo):
+    """Order inside a burst: SubSec, then the camera's file counter, then the source name"""
+    counter = file_counter(photo.path)
+    return (photo.ms, int(counter) if counter else -1, photo.path.name)
+
+def plan_targets(photos, rename_enabled: bool, organize_enabled: bool, organize_dir: Path, filename_pattern: str, folder_pattern: str):
+    """
+    Work out the target path of every photo in a batch in one grouped pass.
+
+    Photos are grouped by their rendered target, with SEQ left unexpanded,
+    and sorted within each group by sequence_sort_key. SEQ then numbers the
+    group in that order, so burst names (and any collision suffixes that are
+    still needed) no longer depend on the order files were listed in.
+    Returns (photo, target_path) pairs.
+    """
+    filename = compile_pattern(filename_pattern, True)
+    folder = compile_pattern(folder_pattern, False)
+    keep_counter = rename_enabled and "counter" in filename.fields
+
+    groups = {}
+    for photo in photos:
+        if keep_counter:
+            # Renamed by this pattern before: keep the counter it wrote, so
+            # renaming again leaves the name alone
+            parsed = filename.parse(name_family(photo.path.name))
+            if parsed and "NUM" in parsed:
+                counter = None if parsed["NUM"] == UNKNOWN_VALUE else parsed["NUM"]
+                photo = photo._replace(metadata={**photo.metadata, "counter": counter})
+
+        if organize_enabled:
+            target_dir = _folder_inside(organize_dir, folder.render(photo.dt, metadata=photo.metadata))
+        else:
+            target_dir = photo.path.parent
+
+        if rename_enabled:
+            target_name = filename.render(photo.dt, photo.ms, photo.path.suffix.lower(), photo.metadata)
+        else:
+            target_name = photo.path.name
+
+        groups.setdefault(target_dir / target_name, []).append(photo)
+
+    numbered = rename_enabled and SEQ_TOKEN in filename.tokens
+    planned = []
+    for key in sorted(groups):
+        members = sorted(groups[key], key=sequence_sort_key)
+        for sequence, photo in enumerate(members, start=1):
+            if numbered:
+                target_name = filename.render(photo.dt, photo.ms, photo.path.suffix.lower(), photo.metadata, sequence)
+                planned.append((photo, key.with_name(target_name)))
+            else:
+                planned.append((photo, key))
+    return planned
+
+def _folder_inside(organize_dir: Path, folder: str) -> Path:
+    """organize_dir / folder, without the parts that could lead out of organize_dir"""
+    return organize_dir.joinpath(*(part for part in folder.split("/") if part not in ("", ".", "..")))
+
+def required_fields(rename_enabled: bool, organize_enabled: bool, filename_pattern: str, folder_pattern: str):
+    """Metadata fields the active patterns need besides the capture time"""
+    fields = frozenset()
+    if rename_enabled:
+        fields |= compile_pattern(filename_pattern, True).fields
+    if organize_enabled:
+        fields |= compile_pattern(folder_pattern, False).fields
+    return fields
+
+def resolve_collision(target_path: Path, reserved=None, vacated=frozenset(), exists=None) -> Path:
+    """
+    First free name for target_path, adding " (1)", " (2)", ... to the stem.
+    Names in `reserved` count as taken, so targets handed out within one
+    batch never clash before they are written. Names in `vacated` belong to
+    files the batch renames away, so they count as free without a probe.
+    Other names are looked up with `exists` (the file system by default).
+    """
+    exists = exists or _exists
+
+    def taken(path):
+        if reserved is not None and path in reserved:
+            return True
+        return path not in vacated and exists(path)
+
+    if not taken(target_path):
         return target_path
 
     stem = target_path.stem
@@ -121,47 +368,576 @@ def resolve_collision(target_path: Path) -> Path:
 
     while True:
         new_path = parent / f"{stem} ({counter}){suffix}"
-        if not new_path.exists():
+        if not taken(new_path):
             return new_path
         counter += 1
 
-def handle_files(source_folder: Path, rename_enabled: bool, organize_enabled: bool, organize_dir: Path, dry_run: bool, logger=print):
-    for root, _, files in os.walk(source_folder, topdown=True):
-        for name in files:
-            full_image_path = Path(root) / name
-            action_description = ""
+COPY_CHUNK_SIZE = 1024 * 1024
+
+def copy_stream(src, target: Path, limiter=None, metrics=None, head: bytes = b""):
+    """
+    Write `head` and then the rest of the file object `src` to target, in
+    chunks the limiter can pace. A partly written target is removed.
+    """
+    try:
+        with _open(target, "wb") as dst:
+            chunk = head or src.read(COPY_CHUNK_SIZE)
+            while chunk:
+                if limiter:
+                    limiter.acquire_bytes(len(chunk), metrics)
+                dst.write(chunk)
+                if metrics:
+                    metrics.add("bytes_copied", len(chunk))
+                chunk = src.read(COPY_CHUNK_SIZE)
+    except BaseException:
+        _unlink(target, missing_ok=True)
+        raise
+
+def move_file(source: Path, target: Path, limiter=None, metrics=None):
+    """
+    Move a single file. Within a filesystem this is one rename; across
+    filesystems the data is copied in chunks so the limiter can pace it.
+    """
+    try:
+        _rename(source, target)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    with _open(source) as src:
+        copy_stream(src, target, limiter, metrics)
+    try:
+        shutil.copystat(source, target)
+    except BaseException:
+        _unlink(target, missing_ok=True)
+        raise
+    _unlink(source)
+
+def order_renames(moves):
+    """
+    Order a batch of renames so none lands on a name another rename in the
+    batch still has to vacate. moves are (source, target) pairs with
+    distinct sources and distinct targets, none renamed onto itself.
+
+    The moves form chains and cycles. A chain is run from the end whose
+    target is free; a cycle is opened by moving one file to a temporary
+    name and closed by moving it on to its target last, so every file is
+    renamed once, or twice if it starts a cycle. Returns (index, source,
+    target) steps; the last step of an index puts that file in place.
+    """
+    by_source = {source: i for i, (source, _) in enumerate(moves)}
+    # The move waiting for each source name to be freed
+    waiting = {target: i for i, (_, target) in enumerate(moves) if target in by_source}
+    targets = {target for _, target in moves}
+    done = [False] * len(moves)
+    steps = []
+
+    def run_chain(i):
+        while i is not None and not done[i]:
+            source, target = moves[i]
+            steps.append((i, source, target))
+            done[i] = True
+            i = waiting.get(source)
+
+    for i, (_, target) in enumerate(moves):
+        if not done[i] and target not in by_source:
+            run_chain(i)
+
+    for i, (source, target) in enumerate(moves):
+        if done[i]:
+            continue
+        counter = 0
+        temporary = source.with_name(f".{source.name}.renaming")
+        while temporary in by_source or temporary in targets or _exists(temporary):
+            counter += 1
+            temporary = source.with_name(f".{source.name}.renaming{counter}")
+        steps.append((i, source, temporary))
+        done[i] = True
+        run_chain(waiting.get(source))
+        steps.append((i, temporary, target))
+    return steps
+
+def rename_batch(moves):
+    """
+    Rename files within one filesystem in the order given by order_renames.
+    Returns one (outcome, path) pair per move: outcome is True, or the
+    exception that stopped it, and path is where the file is now. A file
+    that failed to move keeps its name, so any later rename onto that name
+    fails too instead of overwriting it. A file stopped on its temporary
+    name is given back a visible one: its own if that is still free, or
+    the first free " (n)" variant of it.
+    """
+    outcomes = [True] * len(moves)
+    locations = [target for _, target in moves]
+    occupied = set()
+    batch_names = {name for move in moves for name in move}
+    for i, source, target in order_renames(moves):
+        if outcomes[i] is not True:
+            continue
+        try:
+            if target in occupied:
+                raise FileExistsError(errno.EEXIST, "Target is still in use", str(target))
+            _rename(source, target)
+        except OSError as e:
+            outcomes[i] = e
+            locations[i] = source
+            original = moves[i][0]
+            if source != original:
+                # The second half of a cycle: the original name has been
+                # taken over by now, unless the cycle stopped early
+                visible = resolve_collision(original, batch_names - {original} | occupied)
+                try:
+                    _rename(source, visible)
+                    locations[i] = visible
+                except OSError:
+                    pass
+            occupied.add(locations[i])
+    return list(zip(outcomes, locations))
+
+def load_patterns():
+    """Read the filename and folder patterns once per run"""
+    try:
+        settings = Gio.Settings.new('com.thecirculark.photoorganizer')
+        return settings.get_string('filename-pattern'), settings.get_string('folder-pattern')
+    except:
+        return "YYYYMMDD-HHmmss-MS", "YYYY/MM-Month"
+
+def open_dir_index(source_folder: Path, rename_enabled: bool, organize_enabled: bool, organize_dir: Path, full: bool = False):
+    """Open the skip index scoped to these run options and the current patterns"""
+    signature = make_signature(
+        Path(source_folder).resolve(),
+        rename_enabled,
+        organize_enabled,
+        Path(organize_dir).resolve() if organize_enabled else "",
+        *load_patterns(),
+    )
+    return DirectoryIndex(signature, full=full)
+
+def _record_directory(dir_index, root: str, files, dirs, changed: bool):
+    try:
+        mtime_ns = _stat(root).st_mtime_ns
+        if changed:
+            files, dirs = list_directory(root)
+    except OSError:
+        dir_index.forget(root)
+        return
+    dir_index.record(root, mtime_ns, entries_digest(files + dirs), dirs)
+
+# Tar members are written to a directory with this prefix, made under the
+# destination for each run, while the archive streams past; planning then
+# only has to rename them into place
+STAGING_DIR_PREFIX = ".photoorganizer-staging-"
+
+def _member_path(archive, name: str, seen) -> Path:
+    """Where a member shows up in plans and logs; a repeated name gets a " (n)" suffix, like a collision"""
+    path = archive.path / name
+    repeats = seen.get(path, 0)
+    seen[path] = repeats + 1
+    return path.with_name(f"{path.stem} ({repeats}){path.suffix}") if repeats else path
+
+def _handle_archive(archive, organize_dir: Path, dry_run: bool, logger, planner, cancelled, limiter, metrics,
+                    rename_enabled: bool, filename_pattern: str, folder_pattern: str, fields, profiler=None,
+                    library=None):
+    """
+    Organize the members of a zip or tar archive without extracting it first.
+
+    Every member's date comes from its head. Zip members are then copied
+    straight to their planned target. Tar archives can only be read front
+    to back, so each dated member is written to a staging file in the same
+    pass and renamed to its target once the whole archive is planned.
+    Members are planned per archive directory, like the files of a folder.
+    Each run stages into its own directory, so runs into the same
+    destination leave each other's members alone.
+    """
+    staging_dir = None
+    seen = {}
+    sources = {}
+    sizes = {}
+    groups = {}
+    try:
+        for index, member in enumerate(archive.members()):
+            if cancelled():
+                break
+
+            member_path = _member_path(archive, member.name, seen)
+            if limiter:
+                limiter.acquire_file(metrics)
+            if metrics:
+                metrics.add("files_seen")
+
+            with member.open() as stream:
+                dt, ms, metadata, data = read_stream_metadata(stream, member_path, fields, limiter, metrics)
+                if dt and archive.sequential and not dry_run:
+                    if staging_dir is None:
+                        _mkdir(organize_dir)
+                        staging_dir = Path(tempfile.mkdtemp(prefix=STAGING_DIR_PREFIX, dir=organize_dir))
+                    staged = staging_dir / f"{index:08d}{member_path.suffix.lower()}"
+                    copy_stream(stream, staged, limiter, metrics, data)
+                    sources[member_path] = staged
+                else:
+                    sources[member_path] = member
+                sizes[member_path] = member.size
 
-            dt, ms = get_image_datetime_taken(full_image_path)
             if not dt:
-                action_description = f"Skipping (no EXIF datetime): {full_image_path}"
-                logger(action_description)
+                _log_outcome(logger, planner, f"Skipping (no EXIF datetime): {member_path}",
+                             PlanEntry(str(member_path), "", "skip", "No EXIF datetime", False))
                 continue
 
-            if rename_enabled:
-                target_name = build_filename(dt, ms, full_image_path.suffix.lower())
-            else:
-                target_name = full_image_path.name
+            groups.setdefault(member_path.parent, []).append(PhotoInfo(member_path, dt, ms, metadata))
+        if profiler:
+            profiler.mark("metadata", str(archive.path))
 
-            if organize_enabled:
-                folder_path = build_folder_path(dt)
-                target_dir = organize_dir / folder_path
-                target_path = target_dir / target_name
-            else:
-                target_dir = full_image_path.parent
-                target_path = target_dir / target_name
+        reserved = set()
+        for parent in sorted(groups):
+            if cancelled():
+                break
+            for photo, target_path in plan_targets(groups[parent], rename_enabled, True, organize_dir,
+                                                   filename_pattern, folder_pattern):
+                if cancelled():
+                    break
 
-            if dry_run:
-                final_path = resolve_collision(target_path)
-                action_description = f"[DRY-RUN] Would move: {full_image_path} -> {final_path}"
-            else:
-                try:
-                    target_dir.mkdir(parents=True, exist_ok=True)
-                    final_path = resolve_collision(target_path)
-                    shutil.move(str(full_image_path), str(final_path))
-                    action_description = f"Moved: {full_image_path} -> {final_path}"
-                except Exception as e:
-                    action_description = f"Skipping {full_image_path}: {e}"
+                taken = f"{photo.dt.isoformat()}.{photo.ms}"
+                if library:
+                    same = library.find_same(target_path, sizes[photo.path], taken, _read_taken)
+                    if same:
+                        _skip_existing(photo.path, target_path, same, logger, planner)
+                        continue
+
+                final_path = resolve_collision(target_path, reserved, exists=library.contains if library else None)
+                reserved.add(final_path)
+                source = sources[photo.path]
+
+                entry = None
+                if dry_run:
+                    action_description = f"[DRY-RUN] Would extract: {photo.path} -> {final_path}"
+                else:
+                    try:
+                        if library:
+                            library.make_folder(final_path.parent)
+                            _check_free(final_path)
+                        else:
+                            _mkdir(final_path.parent)
+                        if isinstance(source, Path):
+                            move_file(source, final_path, limiter, metrics)
+                        else:
+                            with source.open() as stream:
+                                copy_stream(stream, final_path, limiter, metrics)
+                        if library:
+                            library.record(final_path, sizes[photo.path], taken)
+                        action_description = f"Extracted: {photo.path} -> {final_path}"
+                    except Exception as e:
+                        action_description = f"Skipping {photo.path}: {e}"
+                        entry = PlanEntry(str(photo.path), str(target_path), "error", str(e), False)
+
+                if entry is None:
+                    collision = final_path != target_path
+                    reason = "Name taken, renamed" if collision else ""
+                    entry = PlanEntry(str(photo.path), str(final_path), "move", reason, collision)
+                _log_outcome(logger, planner, action_description, entry)
+        if library and not dry_run:
+            library.commit()
+        if profiler:
+            profiler.mark("transfer", str(archive.path))
+
+        if cancelled():
+            logger("Cancelled")
+    finally:
+        archive.close()
+        if staging_dir is not None:
+            # Staged members that were never moved into place
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+def _stage_controller(stage: str, bounds, device: str, tuning, logger, metrics):
+    """Concurrency controller for one stage, starting from the level remembered for device"""
+    def on_change(controller, old_limit, new_limit, throughput, latency):
+        logger(f"Concurrency: {stage} workers {old_limit} -> {new_limit} "
+               f"({throughput:.1f} ops/s, {latency * 1000:.1f} ms per op)")
+        if metrics:
+            metrics.set(f"{stage}_workers", new_limit)
+
+    initial = tuning.load(device, stage) if tuning else None
+    controller = ConcurrencyController(stage, *bounds, initial=initial, on_change=on_change)
+    if metrics:
+        metrics.set(f"{stage}_workers", controller.limit)
+    return controller
+
+def _library_details(photo):
+    """(size, capture time) of a photo, as kept in the library index"""
+    try:
+        size = _stat(photo.path).st_size
+    except OSError:
+        size = -1
+    return size, f"{photo.dt.isoformat()}.{photo.ms}"
+
+def _read_taken(path: Path):
+    """Capture time of a file already in the library, as kept in the library index"""
+    dt, ms = get_image_datetime_taken(path)
+    return f"{dt.isoformat()}.{ms}" if dt else None
+
+def _skip_existing(source: Path, target_path: Path, same: Path, logger, planner):
+    if same == target_path:
+        _log_outcome(logger, planner, f"Skipping (already organized): {source} -> {same}",
+                     PlanEntry(str(source), str(same), "skip", "Already organized", False))
+    else:
+        _log_outcome(logger, planner, f"Skipping (duplicate of {same.name}): {source}",
+                     PlanEntry(str(source), str(same), "skip", f"Duplicate of {same.name}", False))
+
+def _check_free(final_path: Path):
+    # The library index answers collision checks; make sure nothing
+    # appeared behind its back before writing
+    if _exists(final_path):
+        raise FileExistsError(errno.EEXIST, "Target appeared since the library index was updated", str(final_path))
+
+def _emit_report(report, metrics, status: str, error: str, logger, reports_dir=None, textfile=None):
+    report.finish(metrics, status, error)
+    try:
+        logger(f"Report written to {report.save(reports_dir)}")
+        if textfile:
+            report.write_textfile(textfile)
+    except OSError as e:
+        logger(f"Could not write run report: {e}")
+
+def handle_files(source_folder: Path, rename_enabled: bool, organize_enabled: bool, organize_dir: Path, dry_run: bool, logger=print, dir_index=None, planner=None,
+                 metadata_cache=None, cancel_event=None, limiter=None, metrics=None,
+                 walk_workers=DEFAULT_WALK_WORKERS, ordered_walk=None,
+                 metadata_workers=DEFAULT_METADATA_WORKERS, transfer_workers=DEFAULT_TRANSFER_WORKERS,
+                 tuning=None, worker_init=None, profiler=None, reports_dir=None, report_textfile=None,
+                 library=None):
+    """
+    Rename and/or organize every photo under source_folder.
+
+    logger receives one human readable line per file, as a LogLine that
+    carries the file's PlanEntry. If given, planner receives each PlanEntry
+    as well. Setting cancel_event stops the run before the next file. Reads
+    and copies are paced by limiter, and counted in metrics. Directories are
+    listed by walk_workers threads; ordered_walk makes the order they are
+    handled in deterministic. It defaults to on when organizing, where
+    directories share the destination and so collision suffixes depend on
+    the order, and to off for in-place renames, which stay in their
+    directory.
+
+    Metadata reads and transfers run on thread pools whose concurrency is
+    tuned while the run goes, within the (min, max) bounds given by
+    metadata_workers and transfer_workers. With a TuningStore as tuning,
+    the best levels found are remembered per device for the next run.
+    worker_init is called in every new pool thread. A RunProfiler passed as
+    profiler is started here, also profiles the pool threads, is told about
+    each stage as it finishes, and is stopped at the end.
+
+    source_folder may also be a zip or tar archive, which is read in place
+    and needs organize_enabled.
+
+    At the end a RunReport is saved to reports_dir (the state dir by
+    default) and, for real runs, exported to report_textfile if given.
+
+    When organizing, library may be a prepared LibraryIndex of organize_dir.
+    Collision checks and folder creation then go through the index, photos
+    already in the destination are skipped, and every write is recorded.
+    """
+    filename_pattern, folder_pattern = load_patterns()
+    if ordered_walk is None:
+        ordered_walk = organize_enabled
+    fields = required_fields(rename_enabled, organize_enabled, filename_pattern, folder_pattern)
+    extract_metadata = metadata_cache.get_metadata if metadata_cache else get_image_metadata
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    if metrics is None:
+        metrics = RunMetrics()
+    if not organize_enabled:
+        library = None
+    report = RunReport(source_folder, organize_dir, rename_enabled, organize_enabled, dry_run)
+    planner = report.recorder(planner)
+    status, error = STATUS_DONE, None
+
+    if profiler:
+        profiler.start()
+    try:
+        archive = open_archive(source_folder)
+        if archive is not None:
+            if not organize_enabled:
+                archive.close()
+                logger(f"Skipping {source_folder}: archives can only be organized into a destination folder")
+                return
+            _handle_archive(archive, Path(organize_dir), dry_run, logger, planner, cancelled, limiter, metrics,
+                            rename_enabled, filename_pattern, folder_pattern, fields, profiler, library)
+            return
+
+        source_device = device_key(source_folder)
+        target_device = device_key(organize_dir) if organize_enabled else source_device
+        metadata_tuner = _stage_controller("metadata", metadata_workers, source_device, tuning, logger, metrics)
+        transfer_tuner = _stage_controller("transfer", transfer_workers, target_device, tuning, logger, metrics)
+
+        def read_photo(path):
+            if cancelled():
+                return None
+            if limiter:
+                limiter.acquire_file(metrics)
+            if metrics:
+                metrics.add("files_seen")
+            return PhotoInfo(path, *extract_metadata(path, fields, limiter, metrics))
+
+        def transfer(item):
+            source, final_path, details = item
+            if cancelled():
+                return None
+            try:
+                if library:
+                    library.make_folder(final_path.parent)
+                    _check_free(final_path)
+                else:
+                    _mkdir(final_path.parent)
+                move_file(source, final_path, limiter, metrics)
+                if library:
+                    library.record(final_path, *details)
+            except Exception as e:
+                return e
+            return True
+
+        def thread_init():
+            if worker_init:
+                worker_init()
+            if profiler:
+                profiler.thread_started()
+
+        metadata_pool = ThreadPoolExecutor(max_workers=metadata_tuner.maximum, thread_name_prefix="metadata",
+                                           initializer=thread_init)
+        transfer_pool = ThreadPoolExecutor(max_workers=transfer_tuner.maximum, thread_name_prefix="transfer",
+                                           initializer=thread_init)
+        try:
+            for root, files, dirs in walk_source(source_folder, dir_index, walk_workers, ordered_walk, metrics,
+                                                     thread_init):
+                if profiler:
+                    profiler.mark("walk", root)
+                failed = False
+                changed = False
+
+                photos = []
+                paths = [Path(root) / name for name in sorted(files)]
+                for photo in run_adaptive(metadata_pool, metadata_tuner, read_photo, paths):
+                    if photo is None:
+                        break
+                    if not photo.dt:
+                        _log_outcome(logger, planner, f"Skipping (no EXIF datetime): {photo.path}",
+                                     PlanEntry(str(photo.path), "", "skip", "No EXIF datetime", False))
+                        continue
+                    photos.append(photo)
+                if profiler:
+                    profiler.mark("metadata", root)
+
+                # Final names are settled here, one at a time, so concurrent
+                # transfers never race for the same free name
+                targets = plan_targets(photos, rename_enabled, organize_enabled, organize_dir,
+                                       filename_pattern, folder_pattern)
+                in_place = not organize_enabled
+                reserved = set()
+                vacated = set()
+                if in_place:
+                    # Renames within the directory run as one batch, so names
+                    # its own files give up are free and unchanged files keep theirs
+                    for photo, target_path in targets:
+                        (reserved if target_path == photo.path else vacated).add(photo.path)
+
+                planned = []
+                details = {}
+                for photo, target_path in targets:
+                    if in_place and target_path == photo.path:
+                        final_path = target_path
+                    else:
+                        if library:
+                            details[photo.path] = _library_details(photo)
+                            same = library.find_same(target_path, *details[photo.path], _read_taken)
+                            if same:
+                                _skip_existing(photo.path, target_path, same, logger, planner)
+                                continue
+                        final_path = resolve_collision(target_path, reserved, vacated,
+                                                       library.contains if library else None)
+                        reserved.add(final_path)
+                    planned.append((photo.path, target_path, final_path))
+                if profiler:
+                    profiler.mark("plan", root)
+
+                # Files a failed rename left under another name, by position
+                left_at = {}
+                if dry_run:
+                    outcomes = [True] * len(planned)
+                elif in_place:
+                    outcomes = [True] * len(planned)
+                    moves = [(i, source, final_path) for i, (source, _, final_path) in enumerate(planned)
+                             if source != final_path]
+                    for (i, source, _), (outcome, path) in zip(moves, rename_batch([move[1:] for move in moves])):
+                        outcomes[i] = outcome
+                        if path != source:
+                            left_at[i] = path
+                else:
+                    outcomes = run_adaptive(transfer_pool, transfer_tuner, transfer,
+                                            [(source, final_path, details.get(source))
+                                             for source, _, final_path in planned])
+
+                for position, ((full_image_path, target_path, final_path), outcome) in enumerate(zip(planned, outcomes)):
+                    if outcome is None:
+                        break
+
+                    if final_path == full_image_path:
+                        _log_outcome(logger, planner, f"Unchanged (already named): {full_image_path}",
+                                     PlanEntry(str(full_image_path), str(final_path), "skip", "Already named", False))
+                        continue
+
+                    entry = None
+                    if dry_run:
+                        action_description = f"[DRY-RUN] Would move: {full_image_path} -> {final_path}"
+                    elif outcome is True:
+                        changed = True
+                        action_description = f"Moved: {full_image_path} -> {final_path}"
+                    elif position in left_at:
+                        failed = changed = True
+                        left = left_at[position]
+                        action_description = f"Skipping {full_image_path}: {outcome}; the file is now {left}"
+                        entry = PlanEntry(str(full_image_path), str(left), "error", f"{outcome}; left as {left.name}",
+                                          False)
+                    else:
+                        failed = True
+                        action_description = f"Skipping {full_image_path}: {outcome}"
+                        entry = PlanEntry(str(full_image_path), str(target_path), "error", str(outcome), False)
 
-            logger(action_description)
+                    if entry is None:
+                        collision = final_path != target_path
+                        reason = "Name taken, renamed" if collision else ""
+                        entry = PlanEntry(str(full_image_path), str(final_path), "move", reason, collision)
+                    _log_outcome(logger, planner, action_description, entry)
+                if library and not dry_run:
+                    library.commit()
+                if profiler:
+                    profiler.mark("transfer", root)
 
+                if cancelled():
+                    # Leave the half-done directory out of the index
+                    logger("Cancelled")
+                    return
 
+                if dir_index and not dry_run:
+                    if failed:
+                        dir_index.forget(root)
+                    else:
+                        _record_directory(dir_index, root, files, dirs, changed)
+                    dir_index.commit()
+        finally:
+            metadata_pool.shutdown(wait=True, cancel_futures=True)
+            transfer_pool.shutdown(wait=True, cancel_futures=True)
+            if tuning:
+                if metadata_tuner.best_limit:
+                    tuning.save(source_device, "metadata", metadata_tuner.best_limit)
+                if transfer_tuner.best_limit and not dry_run:
+                    tuning.save(target_device, "transfer", transfer_tuner.best_limit)
+    except BaseException as e:
+        status, error = STATUS_FAILED, str(e)
+        raise
+    finally:
+        if profiler:
+            for path in profiler.stop():
+                logger(f"Profile written to {path}")
+        if status == STATUS_DONE and cancelled():
+            status = STATUS_CANCELLED
+        _emit_report(report, metrics, status, error, logger, reports_dir, None if dry_run else report_textfile)
@@ -23,9 +23,9 @@ from gi.repository import Gio
 from gi.repository import GLib
 from gi.repository import GObject
 from pathlib import Path
-import threading
 from datetime import datetime
-from .utils import handle_files
+from .run_log import RunLog
+from .plan_view import PoPlanWindow
 
 @Gtk.Template(resource_path='/com/thecirculark/photoorganizer/ui/main.ui')
 class PhotoOrganizerWindow(Adw.ApplicationWindow):
@@ -78,28 +78,37 @@ class PhotoOrganizerWindow(Adw.ApplicationWindow):
         rename_active = self.rename_toggle.get_active()
         dry_run_active = self.dry_run_toggle.get_active()
 
-        # Log window
-        log_win = PoLogWindow(application=self.get_application())
+        # Dry runs get the plan review, real runs the log window
+        if dry_run_active:
+            log_win = PoPlanWindow(application=self.get_application())
+            planner = log_win.plan
+        else:
+            log_win = PoLogWindow(application=self.get_application())
+            planner = None
         log_win.present()
 
-        def run_with_completion():
-            handle_files(
-                source_folder=Path(source_dir),
-                rename_enabled=rename_active,
-                organize_enabled=organize_active,
-                organize_dir=Path(target_dir),
-                dry_run=dry_run_active,
-                logger=log_win.log
-            )
-            log_win.log_end()
-
-        thread = threading.Thread(
-            target=run_with_completion,
-            daemon=True
+        options = {
+            "source": source_dir,
+            "rename": rename_active,
+        }
+        if organize_active:
+            options["destination"] = target_dir
+
+        settings = Gio.Settings.new('com.thecirculark.photoorganizer')
+        if organize_active and settings.get_boolean('library-index'):
+            options["library_index"] = True
+        if settings.get_boolean('profile-runs'):
+            options["profile"] = settings.get_string('profile-mode')
+
+        self.get_application().service.jobs.submit(
+            options,
+            dry_run_active,
+            logger=log_win.log,
+            planner=planner,
+            on_finished=log_win.log_end,
+            artifact_path=log_win.run_log.path
         )
 
-        thread.start()
-
     def on_source_dir_clicked(self, button):
         dialog = Gtk.FileDialog()
         dialog.set_title("Select Source Directory")
@@ -152,32 +161,43 @@ class PoLogWindow(Adw.ApplicationWindow):
         self.file_count = 0
         self.start_time = datetime.now()
 
+        self.run_log = RunLog.from_settings(self.start_time)
+
         self.save_button.connect("clicked", self.on_save_clicked)
 
-        self._append_text("====================")
-        self._append_text("Starting")
-        self._append_text(f"Time started: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        self._append_text("====================")
-        self._append_text("")
+        self._write_lines([
+            "====================",
+            "Starting",
+            f"Time started: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}",
+            "====================",
+            "",
+        ])
 
     def log(self, message: str):
         self.file_count += 1
+        self.run_log.write(message)
         GLib.idle_add(self._append_text, message)
 
-    def log_end(self):
-        GLib.idle_add(self._append_end_message)
-
-    def _append_end_message(self):
+    def log_end(self, job=None):
         end_time = datetime.now()
         duration = end_time - self.start_time
 
-        self._append_text("")
-        self._append_text("====================")
-        self._append_text("Done")
-        self._append_text(f"Time ended: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        self._append_text(f"Total time taken: {duration}")
-        self._append_text(f"Processed {self.file_count} files")
-        self._append_text("====================")
+        self._write_lines([
+            "",
+            "====================",
+            "Done",
+            f"Time ended: {end_time.strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Total time taken: {duration}",
+            f"Processed {self.file_count} files",
+            *(job.metrics.summary_lines() if job else []),
+            "====================",
+        ])
+        self.run_log.close()
+
+    def _write_lines(self, lines):
+        for line in lines:
+            self.run_log.write(line)
+        GLib.idle_add(self._append_text, "\n".join(lines))
 
     def on_save_clicked(self, button):
         dialog = Gtk.FileDialog()
@@ -191,12 +211,8 @@ class PoLogWindow(Adw.ApplicationWindow):
         try:
             file = dialog.save_finish(result)
             if file:
-                start_iter = self.buffer.get_start_iter()
-                end_iter = self.buffer.get_end_iter()
-                text = self.buffer.get_text(start_iter, end_iter, True)
-
-                with open(file.get_path(), 'w') as f:
-                    f.write(text)
+                # The log is already on disk, so copy it rather than the text buffer
+                self.run_log.export(Path(file.get_path()))
 
         except GLib.Error:
             pass
@@ -206,6 +222,3 @@ class PoLogWindow(Adw.ApplicationWindow):
         self.buffer.insert(end_iter, message + "\n")
         self.textview.scroll_to_mark(self.end_mark, 0.0, True, 0.0, 1.0)
         return False
-
-
-
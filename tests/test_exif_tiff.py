@@ -0,0 +1,158 @@
+# test_exif_tiff.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+The TIFF-walking EXIF parser, on well-formed and broken files.
+
+Run with `meson test`, or by hand:
+    python3 tests/test_exif_tiff.py
+"""
+
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src import exif_tiff, utils  # noqa: E402
+from src.exif_tiff import BLOCK_SIZE, parse_ifds, read_tiff_metadata  # noqa: E402
+from src.metrics import RunMetrics  # noqa: E402
+
+TAKEN = datetime(2025, 1, 15, 14, 30, 25)
+
+def ascii_entry(tag: int, text: str):
+    value = text.encode() + b"\0"
+    return tag, 2, len(value), value
+
+def make_ifd(entries, offset: int) -> bytes:
+    """A little-endian IFD placed at offset, with the values that don't fit an entry right after it"""
+    data_at = offset + 2 + 12 * len(entries) + 4
+    table = b""
+    data = b""
+    for tag, kind, count, value in entries:
+        if len(value) <= 4:
+            field = value.ljust(4, b"\0")
+        else:
+            field = struct.pack("<I", data_at + len(data))
+            data += value
+        table += struct.pack("<HHI", tag, kind, count) + field
+    return struct.pack("<H", len(entries)) + table + struct.pack("<I", 0) + data
+
+def make_tiff(subsec="42", model="EOS R6", exif_at=None) -> bytes:
+    """A TIFF header, IFD0 with the camera model and the Exif IFD (at exif_at if given) with the capture time"""
+    ifd0_entries = [ascii_entry(0x0110, model)] if model else []
+
+    def ifd0(pointer):
+        return make_ifd(ifd0_entries + [(0x8769, 4, 1, struct.pack("<I", pointer))], 8)
+
+    exif_at = exif_at or 8 + len(ifd0(0))
+    exif_entries = [ascii_entry(0x9003, TAKEN.strftime("%Y:%m:%d %H:%M:%S"))]
+    if subsec:
+        exif_entries.append(ascii_entry(0x9291, subsec))
+    head = b"II" + struct.pack("<HI", 42, 8) + ifd0(exif_at)
+    return head.ljust(exif_at, b"\0") + make_ifd(exif_entries, exif_at)
+
+def make_jpeg(tiff: bytes) -> bytes:
+    app1 = b"Exif\0\0" + tiff
+    return b"\xff\xd8\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + b"\xff\xd9"
+
+def parse(data: bytes, fields=frozenset()):
+    return parse_ifds(lambda index: data[index * BLOCK_SIZE:(index + 1) * BLOCK_SIZE], len(data), fields)
+
+class ParseTest(unittest.TestCase):
+
+    def test_tiff(self):
+        dt, ms, metadata, _ = parse(make_tiff(), frozenset({"model"}))
+        self.assertEqual((dt, ms, metadata), (TAKEN, "042", {"model": "EOS R6"}))
+
+    def test_jpeg(self):
+        dt, ms, _, _ = parse(make_jpeg(make_tiff(subsec=None)))
+        self.assertEqual((dt, ms), (TAKEN, "000"))
+
+    def test_only_the_blocks_holding_ifds_are_read(self):
+        data = make_tiff(exif_at=64 * BLOCK_SIZE + 100)
+        dt, _, _, blocks = parse(data)
+        self.assertEqual(dt, TAKEN)
+        self.assertEqual(sorted(blocks), [0, 64])
+
+    def test_no_exif_segment(self):
+        self.assertEqual(parse(b"\xff\xd8\xff\xd9")[:3], (None, None, {}))
+
+    def test_truncated_ifd(self):
+        data = make_tiff()
+        # IFD0 holds the model, then the pointer to the Exif IFD
+        (exif_at,) = struct.unpack_from("<I", data, 8 + 2 + 12 + 8)
+        with self.assertRaisesRegex(ValueError, "past the end"):
+            parse(data[:exif_at + 2 + 6])
+
+    def test_offset_out_of_range(self):
+        data = make_tiff(exif_at=1000)
+        with self.assertRaisesRegex(ValueError, "past the end"):
+            parse(data[:1000])
+
+        data = bytearray(make_tiff())
+        # The model's value offset, in IFD0's first entry
+        struct.pack_into("<I", data, 8 + 2 + 8, 0xFFFFFF00)
+        self.assertEqual(parse(bytes(data))[0], TAKEN)
+        with self.assertRaisesRegex(ValueError, "past the end"):
+            parse(bytes(data), frozenset({"model"}))
+
+    def test_not_an_image(self):
+        with self.assertRaisesRegex(ValueError, "Not a JPEG or TIFF"):
+            parse(b"hello world")
+
+class ReadFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp(prefix="photoorganizer-test-"))
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = self.dir / "DSC_0042.jpg"
+        self.path.write_bytes(make_jpeg(make_tiff()))
+
+    def test_read(self):
+        dt, ms, metadata, read = read_tiff_metadata(self.path, frozenset({"model"}))
+        self.assertEqual((dt, ms, metadata), (TAKEN, "042", {"model": "EOS R6"}))
+        self.assertEqual(read, self.path.stat().st_size)
+
+    def test_file_shrinks_while_reading(self):
+        with mock.patch.object(exif_tiff.os, "pread", lambda fd, length, offset: b""):
+            with self.assertRaisesRegex(ValueError, "shrank"):
+                read_tiff_metadata(self.path)
+
+    def test_falls_back_to_the_exif_package(self):
+        metrics = RunMetrics()
+        with mock.patch.object(utils, "read_tiff_metadata", side_effect=ValueError("unsupported")):
+            dt, ms, metadata = utils.get_image_metadata(self.path, frozenset({"model", "counter"}), metrics=metrics)
+        self.assertEqual((dt, ms, metadata), (TAKEN, "042", {"model": "EOS R6", "counter": "0042"}))
+        self.assertEqual(metrics.get("metadata_tiff_fallbacks"), 1)
+
+    def test_unreadable_file_falls_back(self):
+        self.path.write_bytes(b"hello world")
+        metrics = RunMetrics()
+        self.assertEqual(utils.get_image_metadata(self.path, metrics=metrics), (None, None, {}))
+        self.assertEqual(metrics.get("metadata_tiff_fallbacks"), 1)
+
+if __name__ == "__main__":
+    unittest.main()
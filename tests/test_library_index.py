@@ -0,0 +1,111 @@
+# test_library_index.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+The destination library index, opened on a relative path.
+
+Run with `meson test`, or by hand:
+    python3 tests/test_library_index.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src import store  # noqa: E402
+from src.library_index import LibraryIndex  # noqa: E402
+
+TAKEN = "2025-01-15T14:30:25.000"
+
+class RelativeLibraryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp = Path(tempfile.mkdtemp(prefix="photoorganizer-test-"))
+        self.addCleanup(shutil.rmtree, self.temp)
+        cwd = os.getcwd()
+        os.chdir(self.temp)
+        self.addCleanup(os.chdir, cwd)
+
+        folder = Path("lib/2025/01")
+        folder.mkdir(parents=True)
+        (folder / "existing.jpg").write_bytes(b"x" * 10)
+        self.conn = store.connect(self.temp / "store.db")
+        self.addCleanup(self.conn.close)
+
+    def open(self) -> LibraryIndex:
+        library = LibraryIndex(Path("lib"), self.conn)
+        self.scanned = library.prepare()
+        return library
+
+    def test_relative_paths_are_found(self):
+        library = self.open()
+        self.assertEqual(library.root, self.temp.resolve() / "lib")
+        self.assertTrue(library.contains(Path("lib/2025/01/existing.jpg")))
+        self.assertFalse(library.contains(Path("lib/2025/01/missing.jpg")))
+        self.assertTrue(library.has_folder(Path("lib/2025/01")))
+
+    def test_writes_are_recorded(self):
+        library = self.open()
+        target = Path("lib/2025/01/new.jpg")
+        target.write_bytes(b"y" * 20)
+        library.record(target, 20, TAKEN)
+        self.assertTrue(library.contains(target))
+        self.assertEqual(library.find_same(Path("lib/2025/01/new (1).jpg"), 20, TAKEN),
+                         Path("lib/2025/01/new.jpg"))
+        library.commit()
+
+        # The index's own writes don't count as drift
+        self.open()
+        self.assertEqual(self.scanned, 0)
+
+    def test_make_folder(self):
+        library = self.open()
+        Path("lib/2025/02").mkdir()
+        Path("lib/2025/02/outside.jpg").write_bytes(b"z")
+
+        library.make_folder(Path("lib/2025/02/new"))
+        self.assertTrue(Path("lib/2025/02/new").is_dir())
+        self.assertTrue(library.has_folder(Path("lib/2025/02/new")))
+        # Already there before, so scanned rather than taken to be empty
+        self.assertTrue(library.contains(Path("lib/2025/02/outside.jpg")))
+
+    def test_unknown_capture_time_is_read(self):
+        library = self.open()
+        read = []
+
+        def read_taken(path):
+            read.append(path)
+            return "2024-01-01T00:00:00.000"
+
+        target = Path("lib/2025/01/existing (1).jpg")
+        self.assertIsNone(library.find_same(target, 10, TAKEN))
+        self.assertIsNone(library.find_same(target, 10, TAKEN, read_taken))
+        self.assertEqual(read, [Path("lib/2025/01/existing.jpg")])
+        # Kept, so not read again
+        self.assertIsNone(library.find_same(target, 10, TAKEN, read_taken))
+        self.assertEqual(len(read), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+# test_naming_patterns.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Rendering and parsing names, and planning the targets of a batch.
+
+Run with `meson test`, or by hand:
+    python3 tests/test_naming_patterns.py
+"""
+
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.naming_patterns import SEQ_TOKEN, UNKNOWN_VALUE, compile_pattern  # noqa: E402
+from src.utils import PhotoInfo, file_counter, plan_targets  # noqa: E402
+
+TAKEN = datetime(2025, 1, 15, 14, 30, 25)
+LIBRARY = Path("/library")
+
+def photo(name: str, dt=TAKEN, ms="000", **metadata) -> PhotoInfo:
+    return PhotoInfo(Path("/source") / name, dt, ms, metadata)
+
+def plan(photos, filename_pattern="YYYYMMDD-HHmmss-MS", folder_pattern="YYYY/MM", organize=True):
+    return {source.path.name: target for source, target in
+            plan_targets(photos, True, organize, LIBRARY, filename_pattern, folder_pattern)}
+
+class RenderParseTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        pattern = compile_pattern("YYYYMMDD-HHmmss-MS_CAMERA_NUM_SEQ")
+        name = pattern.render(TAKEN, "123", ".jpg", {"model": "EOS R6", "counter": "0042"}, 3)
+        self.assertEqual(name, "20250115-143025-123_EOS R6_0042_03.jpg")
+        self.assertEqual(pattern.parse(name), {
+            "YYYY": "2025", "MM": "01", "DD": "15", "HH": "14", "mm": "30", "ss": "25",
+            "MS": "123", "CAMERA": "EOS R6", "NUM": "0042", SEQ_TOKEN: "03",
+        })
+
+    def test_parse_rejects_other_names(self):
+        pattern = compile_pattern("YYYYMMDD_NUM")
+        self.assertIsNone(pattern.parse("DSC_0042.jpg"))
+        self.assertIsNone(pattern.parse("20250115_0042_extra.jpg"))
+
+    def test_parse_unknown_counter(self):
+        pattern = compile_pattern("NUM_YYYYMMDD")
+        name = pattern.render(TAKEN, extension=".jpg", metadata={})
+        self.assertEqual(name, f"{UNKNOWN_VALUE}_20250115.jpg")
+        self.assertEqual(pattern.parse(name)["NUM"], UNKNOWN_VALUE)
+
+    def test_token_text_in_values_is_left_alone(self):
+        pattern = compile_pattern("LENS_YYYY")
+        self.assertEqual(pattern.render(TAKEN, metadata={"lens_model": "24-70mm MM"}), "24-70mm MM_2025")
+
+class MetadataValueTest(unittest.TestCase):
+
+    def test_values_stay_one_path_part(self):
+        folder = compile_pattern("CAMERA/YYYY", False)
+        self.assertEqual(folder.render(TAKEN, metadata={"model": "../../etc"}), "..-..-etc/2025")
+        self.assertEqual(folder.render(TAKEN, metadata={"model": "a/b\0c"}), "a-bc/2025")
+
+    def test_empty_and_dot_values_are_unknown(self):
+        folder = compile_pattern("CAMERA", False)
+        for value in (None, "", "  ", ".", ".."):
+            self.assertEqual(folder.render(TAKEN, metadata={"model": value}), UNKNOWN_VALUE)
+
+    def test_targets_stay_inside_the_destination(self):
+        for model in ("..", "../..", "/", "./../x"):
+            targets = plan([photo("DSC_0001.jpg", model=model)], folder_pattern="CAMERA/YYYY")
+            target = targets["DSC_0001.jpg"]
+            self.assertNotIn("..", target.parts)
+            self.assertTrue(target.is_relative_to(LIBRARY), target)
+
+class FileCounterTest(unittest.TestCase):
+
+    def test_camera_names(self):
+        self.assertEqual(file_counter(Path("DSC_0042.JPG")), "0042")
+        self.assertEqual(file_counter(Path("_DSC1234.NEF")), "1234")
+        self.assertEqual(file_counter(Path("P1010001.JPG")), "1010001")
+
+    def test_other_names(self):
+        self.assertIsNone(file_counter(Path("20250115-143025-000.jpg")))
+        self.assertIsNone(file_counter(Path("IMG_20250115_143025.jpg")))
+
+class PlanTargetsTest(unittest.TestCase):
+
+    def test_sequence_within_a_second(self):
+        photos = [photo("DSC_0003.jpg", ms="500"), photo("DSC_0002.jpg"), photo("DSC_0001.jpg")]
+        targets = plan(photos, "YYYYMMDD_HHmmss_SEQ")
+        self.assertEqual({name: target.name for name, target in targets.items()}, {
+            "DSC_0001.jpg": "20250115_143025_01.jpg",
+            "DSC_0002.jpg": "20250115_143025_02.jpg",
+            "DSC_0003.jpg": "20250115_143025_03.jpg",
+        })
+
+    def test_sequence_is_idempotent(self):
+        photos = [photo(f"20250115_143025_{n:02d}.jpg") for n in (2, 1, 3)]
+        targets = plan(photos, "YYYYMMDD_HHmmss_SEQ", organize=False)
+        for source in photos:
+            self.assertEqual(targets[source.path.name], source.path)
+
+    def test_counter_is_idempotent(self):
+        first = plan([photo("DSC_0042.jpg", counter="0042")], "NUM_YYYYMMDD", organize=False)
+        self.assertEqual(first["DSC_0042.jpg"].name, "0042_20250115.jpg")
+
+        # Renaming again reads the counter back from the name it was given
+        for name in ("0042_20250115.jpg", f"{UNKNOWN_VALUE}_20250115.jpg"):
+            again = plan([photo(name, counter=file_counter(Path(name)))], "NUM_YYYYMMDD", organize=False)
+            self.assertEqual(again[name].name, name)
+
+if __name__ == "__main__":
+    unittest.main()
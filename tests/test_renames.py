@@ -0,0 +1,145 @@
+# test_renames.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Batches of renames in place: swaps, chains, cycles and failures part way.
+
+Run with `meson test`, or by hand:
+    python3 tests/test_renames.py
+"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src import utils  # noqa: E402
+from src.utils import order_renames, rename_batch  # noqa: E402
+
+class RenameTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp(prefix="photoorganizer-test-"))
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def files(self, *names):
+        """Create files whose content is their own name"""
+        for name in names:
+            (self.dir / name).write_text(name)
+
+    def moves(self, *pairs):
+        return [(self.dir / source, self.dir / target) for source, target in pairs]
+
+    def contents(self):
+        """{name: content} of every file left in the directory"""
+        return {path.name: path.read_text() for path in self.dir.iterdir()}
+
+    def fail_on(self, source: str, target: str):
+        """Make the rename of source to target fail, wherever it comes in the batch"""
+        rename = utils._rename
+
+        def failing(from_path, to_path):
+            if Path(from_path).name == source and Path(to_path).name == target:
+                raise PermissionError(13, "Permission denied", str(from_path))
+            rename(from_path, to_path)
+
+        return mock.patch.object(utils, "_rename", failing)
+
+class OrderRenamesTest(RenameTest):
+
+    def test_chain_runs_from_the_free_end(self):
+        moves = self.moves(("a", "b"), ("b", "c"), ("c", "d"))
+        steps = [(source.name, target.name) for _, source, target in order_renames(moves)]
+        self.assertEqual(steps, [("c", "d"), ("b", "c"), ("a", "b")])
+
+    def test_cycle_goes_through_one_temporary_name(self):
+        moves = self.moves(("a", "b"), ("b", "c"), ("c", "a"))
+        steps = [(i, source.name, target.name) for i, source, target in order_renames(moves)]
+        self.assertEqual(steps, [(0, "a", ".a.renaming"), (2, "c", "a"), (1, "b", "c"), (0, ".a.renaming", "b")])
+
+    def test_temporary_name_avoids_existing_files(self):
+        self.files(".a.renaming")
+        moves = self.moves(("a", "b"), ("b", "a"))
+        temporaries = [target.name for _, _, target in order_renames(moves) if target.name.startswith(".")]
+        self.assertEqual(temporaries, [".a.renaming1"])
+
+class RenameBatchTest(RenameTest):
+
+    def test_swap(self):
+        self.files("a", "b")
+        results = rename_batch(self.moves(("a", "b"), ("b", "a")))
+        self.assertEqual(results, [(True, self.dir / "b"), (True, self.dir / "a")])
+        self.assertEqual(self.contents(), {"a": "b", "b": "a"})
+
+    def test_chain(self):
+        self.files("a", "b", "c")
+        results = rename_batch(self.moves(("a", "b"), ("b", "c"), ("c", "d")))
+        self.assertEqual([outcome for outcome, _ in results], [True, True, True])
+        self.assertEqual(self.contents(), {"b": "a", "c": "b", "d": "c"})
+
+    def test_cycle(self):
+        self.files("a", "b", "c")
+        results = rename_batch(self.moves(("a", "b"), ("b", "c"), ("c", "a")))
+        self.assertEqual([outcome for outcome, _ in results], [True, True, True])
+        self.assertEqual(self.contents(), {"a": "c", "b": "a", "c": "b"})
+
+    def test_failure_in_a_chain_blocks_renames_onto_the_file(self):
+        self.files("a", "b")
+        with self.fail_on("b", "c"):
+            results = rename_batch(self.moves(("a", "b"), ("b", "c")))
+        self.assertIsInstance(results[0][0], FileExistsError)
+        self.assertIsInstance(results[1][0], PermissionError)
+        self.assertEqual([path.name for _, path in results], ["a", "b"])
+        self.assertEqual(self.contents(), {"a": "a", "b": "b"})
+
+    def test_failure_opening_a_cycle(self):
+        self.files("a", "b")
+        with self.fail_on("a", ".a.renaming"):
+            results = rename_batch(self.moves(("a", "b"), ("b", "a")))
+        self.assertIsInstance(results[0][0], PermissionError)
+        self.assertIsInstance(results[1][0], FileExistsError)
+        self.assertEqual([path.name for _, path in results], ["a", "b"])
+        self.assertEqual(self.contents(), {"a": "a", "b": "b"})
+
+    def test_failure_closing_a_cycle_leaves_a_visible_name(self):
+        self.files("a", "b", "c")
+        with self.fail_on(".a.renaming", "b"):
+            results = rename_batch(self.moves(("a", "b"), ("b", "c"), ("c", "a")))
+        outcome, path = results[0]
+        self.assertIsInstance(outcome, PermissionError)
+        # "a" went to c's file, and "b" is still reserved for this move
+        self.assertEqual(path, self.dir / "a (1)")
+        self.assertEqual([outcome for outcome, _ in results[1:]], [True, True])
+        self.assertEqual(self.contents(), {"a": "c", "a (1)": "a", "c": "b"})
+
+    def test_failure_closing_a_cycle_stopped_early(self):
+        self.files("a", "b")
+        with self.fail_on("b", "a"), self.fail_on(".a.renaming", "b"):
+            results = rename_batch(self.moves(("a", "b"), ("b", "a")))
+        # Nothing took over "a", so the file gets its own name back
+        self.assertEqual([path.name for _, path in results], ["a", "b"])
+        self.assertEqual(self.contents(), {"a": "a", "b": "b"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+# test_service.py
+#
+# Copyright 2026 Andrew
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Drive the organizer service over a private session bus.
+
+Run with `meson test`, or by hand:
+    dbus-run-session -- python3 tests/test_service.py
+
+The service runs in a child process (this file with --serve) hosting
+OrganizerService in a plain Gio.Application, so no display is needed.
+Settings, logs and caches live in a temporary directory.
+"""
+
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+TIMEOUT = 30
+
+def make_jpeg(path: Path, taken: str):
+    """A minimal JPEG whose only EXIF tag is DateTimeOriginal"""
+    value = taken.encode() + b"\0"
+    exif_ifd = 8 + 2 + 12 + 4
+    tiff = b"II" + struct.pack("<HI", 42, 8)
+    tiff += struct.pack("<H", 1) + struct.pack("<HHII", 0x8769, 4, 1, exif_ifd) + struct.pack("<I", 0)
+    tiff += struct.pack("<H", 1) + struct.pack("<HHII", 0x9003, 2, len(value), exif_ifd + 2 + 12 + 4)
+    tiff += struct.pack("<I", 0) + value
+    app1 = b"Exif\0\0" + tiff
+    path.write_bytes(b"\xff\xd8\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + b"\xff\xd9")
+
+def prepare_environment(temp: Path):
+    """Private settings, state and cache directories, set before GLib reads them"""
+    schemas = temp / "schemas"
+    schemas.mkdir()
+    shutil.copy(ROOT / "data" / "com.thecirculark.photoorganizer.gschema.xml", schemas)
+    subprocess.run(["glib-compile-schemas", str(schemas)], check=True)
+    os.environ.update({
+        "GSETTINGS_SCHEMA_DIR": str(schemas),
+        "GSETTINGS_BACKEND": "memory",
+        "XDG_STATE_HOME": str(temp / "state"),
+        "XDG_CACHE_HOME": str(temp / "cache"),
+    })
+
+def serve():
+    from gi.repository import Gio
+    from src.service import BUS_NAME, OrganizerService
+
+    class ServiceHost(Gio.Application):
+        def __init__(self):
+            super().__init__(application_id=BUS_NAME, flags=Gio.ApplicationFlags.IS_SERVICE)
+            self.service = OrganizerService(self)
+            self.service.apply_settings(Gio.Settings.new(BUS_NAME))
+            self.set_inactivity_timeout(TIMEOUT * 1000)
+
+        def do_dbus_register(self, connection, object_path):
+            Gio.Application.do_dbus_register(self, connection, object_path)
+            self.service.register(connection, object_path)
+            return True
+
+        def do_dbus_unregister(self, connection, object_path):
+            self.service.unregister(connection)
+            Gio.Application.do_dbus_unregister(self, connection, object_path)
+
+    return ServiceHost().run([sys.argv[0]])
+
+class ServiceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        if not os.environ.get("DBUS_SESSION_BUS_ADDRESS"):
+            raise unittest.SkipTest("needs a session bus, run under dbus-run-session")
+        from gi.repository import Gio
+        from src.service import BUS_NAME
+
+        cls.temp = Path(tempfile.mkdtemp(prefix="photoorganizer-test-"))
+        prepare_environment(cls.temp)
+        cls.host = subprocess.Popen([sys.executable, __file__, "--serve"])
+
+        cls.bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        deadline = time.monotonic() + TIMEOUT
+        while not cls._has_owner(BUS_NAME):
+            if time.monotonic() > deadline or cls.host.poll() is not None:
+                cls.host.kill()
+                raise RuntimeError("service did not come up on the bus")
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.host.terminate()
+        cls.host.wait(TIMEOUT)
+        shutil.rmtree(cls.temp, ignore_errors=True)
+
+    @classmethod
+    def _has_owner(cls, name: str) -> bool:
+        from gi.repository import GLib
+        reply = cls.bus.call_sync("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+                                  "NameHasOwner", GLib.Variant("(s)", (name,)), None, 0, -1, None)
+        return reply.unpack()[0]
+
+    def setUp(self):
+        from gi.repository import Gio, GLib
+        from src.service import INTERFACE_NAME, OBJECT_PATH
+
+        self.logs = {}
+        self.finished = {}
+        self.loop = GLib.MainLoop()
+
+        def on_signal(connection, sender, object_path, interface_name, signal_name, parameters):
+            if signal_name == "JobLog":
+                job_id, message = parameters.unpack()
+                self.logs.setdefault(job_id, []).append(message)
+            elif signal_name == "JobFinished":
+                job_id, state = parameters.unpack()
+                self.finished[job_id] = state
+                self.loop.quit()
+
+        self.subscription = self.bus.signal_subscribe(None, INTERFACE_NAME, None, OBJECT_PATH, None,
+                                                      Gio.DBusSignalFlags.NONE, on_signal)
+        self.work = Path(tempfile.mkdtemp(dir=self.temp))
+
+    def tearDown(self):
+        self.bus.signal_unsubscribe(self.subscription)
+
+    def call(self, method: str, parameters, reply_type: str):
+        from gi.repository import GLib
+        from src.service import BUS_NAME, INTERFACE_NAME, OBJECT_PATH
+        reply = self.bus.call_sync(BUS_NAME, OBJECT_PATH, INTERFACE_NAME, method, parameters,
+                                   GLib.VariantType(reply_type) if reply_type else None, 0, TIMEOUT * 1000, None)
+        return reply.unpack() if reply_type else None
+
+    def submit(self, method: str, **options) -> int:
+        from gi.repository import GLib
+        variants = {key: GLib.Variant("b" if isinstance(value, bool) else "s", value)
+                    for key, value in options.items()}
+        (job_id,) = self.call(method, GLib.Variant("(a{sv}i)", (variants, 0)), "(u)")
+        return job_id
+
+    def wait_finished(self, job_id: int) -> str:
+        from gi.repository import GLib
+        timed_out = []
+
+        def on_timeout():
+            timed_out.append(True)
+            self.loop.quit()
+            return GLib.SOURCE_REMOVE
+
+        timeout = GLib.timeout_add_seconds(TIMEOUT, on_timeout)
+        while job_id not in self.finished and not timed_out:
+            self.loop.run()
+        if not timed_out:
+            GLib.source_remove(timeout)
+        self.assertIn(job_id, self.finished, f"job {job_id} did not finish")
+        return self.finished[job_id]
+
+    def make_source(self, count: int) -> Path:
+        source = self.work / "source"
+        source.mkdir()
+        for index in range(count):
+            make_jpeg(source / f"IMG_{index:04d}.jpg", f"2025:03:{index % 28 + 1:02d} 10:{index % 60:02d}:00")
+        return source
+
+    def test_dry_run(self):
+        source = self.make_source(3)
+        job_id = self.submit("DryRun", source=str(source), destination=str(self.work / "library"))
+        self.assertEqual(self.wait_finished(job_id), "done")
+        self.assertEqual(sum("[DRY-RUN] Would move" in line for line in self.logs.get(job_id, [])), 3)
+        self.assertEqual(len(list(source.iterdir())), 3)
+        self.assertFalse((self.work / "library").exists())
+
+    def test_organize(self):
+        source = self.make_source(3)
+        library = self.work / "library"
+        job_id = self.submit("Organize", source=str(source), destination=str(library), rename=True)
+        self.assertEqual(self.wait_finished(job_id), "done")
+        self.assertEqual(list(source.iterdir()), [])
+        self.assertEqual(sorted(path.name for path in (library / "2025" / "03-March").iterdir()),
+                         ["20250301-100000-000.jpg", "20250302-100100-000.jpg", "20250303-100200-000.jpg"])
+        self.assertEqual(self.call("ListJobs", None, "(a(uss))"), ([],))
+
+    def test_cancel(self):
+        from gi.repository import GLib
+        source = self.make_source(300)
+        job_id = self.submit("DryRun", source=str(source))
+        (jobs,) = self.call("ListJobs", None, "(a(uss))")
+        self.assertIn(job_id, [listed[0] for listed in jobs])
+        self.assertEqual(self.call("Cancel", GLib.Variant("(u)", (job_id,)), "(b)"), (True,))
+        self.assertEqual(self.wait_finished(job_id), "cancelled")
+        self.assertEqual(self.call("Cancel", GLib.Variant("(u)", (job_id,)), "(b)"), (False,))
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--serve"]:
+        sys.exit(serve())
+    unittest.main()